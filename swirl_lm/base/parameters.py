@@ -15,7 +15,7 @@
 """Library for input config for the incompressible Navier-Stokes solver."""
 
 import os.path
-from typing import Callable, List, Mapping, Optional, Sequence, Tuple
+from typing import Callable, FrozenSet, List, Mapping, Optional, Sequence, Tuple
 
 from absl import flags
 from absl import logging
@@ -238,6 +238,8 @@ class SwirlLMParameters(grid_parametrization.GridParametrization):
     self.scalars = config.scalars
 
     self.scalar_lib = {scalar.name: scalar for scalar in self.scalars}
+    self._transport_scalars_set = frozenset(
+        scalar.name for scalar in self.scalars if scalar.solve_scalar)
 
     # Check if the microphysics model (if used) is the same for all scalars.
     microphysics = None
@@ -663,6 +665,11 @@ class SwirlLMParameters(grid_parametrization.GridParametrization):
     """
     return [scalar.name for scalar in self.scalars if scalar.solve_scalar]
 
+  @property
+  def transport_scalars_set(self) -> FrozenSet[str]:
+    """Retrieves the names of transported scalars as a set for lookups."""
+    return self._transport_scalars_set
+
   @property
   def additional_states_update_fn(self):
     """A function that updates the additional states.
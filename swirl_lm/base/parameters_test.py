@@ -0,0 +1,46 @@
+# Copyright 2023 The swirl_lm Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for parameters."""
+
+from swirl_lm.base import parameters
+import tensorflow as tf
+
+_CONFIG = """
+    solver_procedure: VARIABLE_DENSITY
+    convection_scheme: CONVECTION_SCHEME_QUICK
+    time_integration_scheme: TIME_SCHEME_CN_EXPLICIT_ITERATION
+    scalars { name: "Y_O" diffusivity: 1e-5 density: 1.0 }
+    scalars { name: "T" diffusivity: 1e-5 density: 1.0 solve_scalar: false }
+    scalars { name: "theta" diffusivity: 1e-5 density: 1.0 }
+"""
+
+
+class SwirlLMParametersTest(tf.test.TestCase):
+
+  def testTransportScalarsSetContainsOnlySolvedScalars(self):
+    """The set of transported scalars excludes scalars that are not solved."""
+    params = parameters.SwirlLMParameters.config_from_text_proto(_CONFIG)
+
+    self.assertIsInstance(params.transport_scalars_set, frozenset)
+    self.assertEqual(
+        frozenset(['Y_O', 'theta']), params.transport_scalars_set
+    )
+    self.assertCountEqual(
+        params.transport_scalars_names, params.transport_scalars_set
+    )
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -374,6 +374,25 @@ class ImmersedBoundaryMethod(object):
     """Provides the type of immersed boundary method for this instance."""
     return self._ib_params.WhichOneof('type')
 
+  @property
+  def updates_forcing(self) -> bool:
+    """Whether `update_forcing` modifies the additional states.
+
+    Raises:
+      ValueError: If the type of the immersed boundary method is not valid.
+    """
+    if self.type in (
+        'cartesian_grid',
+        'mac',
+        'sponge',
+        'feedback_force_1d_interp',
+    ):
+      return False
+    elif self.type in ('direct_forcing', 'direct_forcing_1d_interp'):
+      return True
+    else:
+      raise ValueError(f'{self.type} is not a valid IB type.')
+
   def update_states(
       self,
       kernel_op: get_kernel_fn.ApplyKernelOp,
@@ -440,12 +459,7 @@ class ImmersedBoundaryMethod(object):
     """Updates `additional_states` during each subiteration."""
     del replica_id, replicas
 
-    if self.type in (
-        'cartesian_grid',
-        'mac',
-        'sponge',
-        'feedback_force_1d_interp',
-    ):
+    if not self.updates_forcing:
       return additional_states
     elif self.type == 'direct_forcing':
       return self._apply_direct_forcing_method(states, additional_states)
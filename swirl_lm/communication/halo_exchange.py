@@ -28,7 +28,7 @@
 """Helper library for performing Halo exchanges."""
 
 from collections import abc
-from typing import Optional, Sequence, Union
+from typing import List, Optional, Sequence, Union
 
 import numpy as np
 from six.moves import range
@@ -241,9 +241,19 @@ def _alias_inplace_update(x, plane, low):
   return lambda: tf.tensor_scatter_nd_update(x, indices, [tf.squeeze(low),])
 
 
+def _halos_from_self(z_list, dim, plane, width, is_first,
+                     left_or_top_padding):
+  """Returns the planes that are sent to the neighbors in `dim` for `plane`."""
+  plane_to_exchange = 2 * width - plane - 1
+  if dim == 2:
+    return z_list[plane_to_exchange], z_list[-(plane_to_exchange + 1)]
+  return _halo_from_self_dim_0_1(z_list, dim, plane_to_exchange, is_first,
+                                 left_or_top_padding)
+
+
 def _inplace_halo_exchange_1d(z_list, dim, replica_id, replicas, replica_dim,
                               periodic, bc_low, bc_high, width, plane,
-                              left_or_top_padding):
+                              left_or_top_padding, halos_from_neighbor=None):
   """Performs halo exchange and assigns values to points in a boundary plane.
 
   This function exchanges and sets a single plane in the boundary or halo
@@ -278,6 +288,9 @@ def _inplace_halo_exchange_1d(z_list, dim, replica_id, replicas, replica_dim,
     left_or_top_padding: The amount of left or top padding, where left and top
       refer to the 2d plane formed by dims 0 and 1. This is used only if `dim`
       is 0 or 1.
+    halos_from_neighbor: An optional tuple of the high and low halos received
+      from the neighbors. If provided, no communication is performed in this
+      function, which allows the exchange of multiple fields to be batched.
 
   Returns:
     The `z_list` with its `plane` boundary on the low side and corresponding
@@ -352,11 +365,14 @@ def _inplace_halo_exchange_1d(z_list, dim, replica_id, replicas, replica_dim,
 
   plane_to_exchange = 2 * width - plane - 1
   if dim == 2:
-    low_halo_from_self = z_list[plane_to_exchange]
-    high_halo_from_self = z_list[-(plane_to_exchange + 1)]
-    high_halo_from_neighbor, low_halo_from_neighbor = _do_exchange(
-        replicas, replica_dim, low_halo_from_self, high_halo_from_self,
-        periodic)
+    if halos_from_neighbor is None:
+      low_halo_from_self, high_halo_from_self = _halos_from_self(
+          z_list, dim, plane, width, is_first, left_or_top_padding)
+      high_halo_from_neighbor, low_halo_from_neighbor = _do_exchange(
+          replicas, replica_dim, low_halo_from_self, high_halo_from_self,
+          periodic)
+    else:
+      high_halo_from_neighbor, low_halo_from_neighbor = halos_from_neighbor
     low_plane_for_neumann = z_list[plane + 1]
     high_plane_for_neumann = z_list[-(plane + 2)]
     low_plane_for_outermost_slice = z_list[plane]
@@ -369,17 +385,25 @@ def _inplace_halo_exchange_1d(z_list, dim, replica_id, replicas, replica_dim,
     return grid
 
   # dim in (0, 1).
-  low_halo_from_self, high_halo_from_self = _halo_from_self_dim_0_1(
-      z_list, dim, plane_to_exchange, is_first, left_or_top_padding)
-  high_halo_from_neighbor, low_halo_from_neighbor = _do_exchange(
-      replicas, replica_dim, low_halo_from_self, high_halo_from_self, periodic)
-
-  # If the plane being processed is the innermost (`plane = width - 1`), the
-  # same plane is used in applying Neumann boundary conditions. `plane`
-  # is an index relative to an ordered sequence of low-side boundary planes
-  # where the 0th index is the outermost boundary plane.
-  low_plane_for_neumann = low_halo_from_self
-  high_plane_for_neumann = high_halo_from_self
+  if halos_from_neighbor is None:
+    low_halo_from_self, high_halo_from_self = _halos_from_self(
+        z_list, dim, plane, width, is_first, left_or_top_padding)
+    high_halo_from_neighbor, low_halo_from_neighbor = _do_exchange(
+        replicas, replica_dim, low_halo_from_self, high_halo_from_self,
+        periodic)
+    # If the plane being processed is the innermost (`plane = width - 1`), the
+    # same plane is used in applying Neumann boundary conditions. `plane`
+    # is an index relative to an ordered sequence of low-side boundary planes
+    # where the 0th index is the outermost boundary plane.
+    low_plane_for_neumann = low_halo_from_self
+    high_plane_for_neumann = high_halo_from_self
+  else:
+    # The halos sent to the neighbors are not sliced when they are supplied, so
+    # the planes used by the boundary conditions are sliced below, only for the
+    # sides that need them.
+    high_halo_from_neighbor, low_halo_from_neighbor = halos_from_neighbor
+    low_plane_for_neumann = None
+    high_plane_for_neumann = None
   low_plane_for_outermost_slice, high_plane_for_outermost_slice = (
       _halo_from_self_dim_0_1(z_list, dim, plane_to_exchange - 1, is_first,
                               left_or_top_padding))
@@ -408,6 +432,16 @@ def _inplace_halo_exchange_1d(z_list, dim, replica_id, replicas, replica_dim,
       high_plane_for_outermost_slice = _plane_for_bc_dim_0_1(
           z_list, plane, dim, False, is_first, left_or_top_padding)
 
+  # The plane next to `plane` is the one used by the Neumann and Dirichlet
+  # boundary conditions, which is the innermost halo sent to the neighbors.
+  if low_plane_for_neumann is None and bc_low and not periodic:
+    low_plane_for_neumann = _plane_for_bc_dim_0_1(z_list, plane + 1, dim, True,
+                                                  is_first, left_or_top_padding)
+  if high_plane_for_neumann is None and bc_high and not periodic:
+    high_plane_for_neumann = _plane_for_bc_dim_0_1(z_list, plane + 1, dim,
+                                                   False, is_first,
+                                                   left_or_top_padding)
+
   low_edge = maybe_replace_halo_from_boundary_conditions(SideType.LOW)
   high_edge = maybe_replace_halo_from_boundary_conditions(SideType.HIGH)
 
@@ -542,28 +576,7 @@ def inplace_halo_exchange(
       # `_inplace_halo_exchange_1d` with planes in this order is necessary in
       # order for Neumann boundary conditions to be applied correctly.
       for plane in range(width - 1, -1, -1):
-        # Select the relevant planes from the sequence of bc planes.
-        if bc_low:
-          # Create a mutable copy of the bc passed in.
-          bc_low_plane = list(bc_low)
-          # If the boundary condition is a list of planes select the relevant
-          # one.
-          bc_low_plane[1] = (
-              bc_low_plane[1]
-              if isinstance(bc_low_plane[1], float) else bc_low_plane[1][plane])
-        else:
-          bc_low_plane = None
-        if bc_high:
-          # Create a mutable copy of the bc passed in.
-          bc_high_plane = list(bc_high)
-          # If the boundary condition is a list of planes select the relevant
-          # one.
-          bc_high_plane[1] = (
-              bc_high_plane[1] if isinstance(bc_high_plane[1], float) else
-              bc_high_plane[1][width - plane - 1])
-        else:
-          bc_high_plane = None
-
+        bc_low_plane, bc_high_plane = _bc_planes(bc_low, bc_high, plane, width)
         z_list = _inplace_halo_exchange_1d(z_list, dim,
                                            replica_id, replicas, replica_dim,
                                            bool(periodic), bc_low_plane,
@@ -575,6 +588,130 @@ def inplace_halo_exchange(
     return z_list
 
 
+def inplace_halo_exchange_batched(
+    z_lists: Sequence[FlowFieldVal],
+    dims: Sequence[int],
+    replica_id: tf.Tensor,
+    replicas: np.ndarray,
+    replica_dims: Sequence[int],
+    periodic_dims: Optional[Sequence[bool]] = None,
+    boundary_conditions: Optional[
+        Sequence[Optional[BoundaryConditionsSpec]]] = None,
+    width: int = 1) -> List[FlowFieldVal]:
+  """Performs a N-dimensional halo exchange for multiple fields at once.
+
+  This is equivalent to calling `inplace_halo_exchange` for each field in
+  `z_lists`, except that the halos of all fields are stacked and sent to the
+  neighbors with a single collective per plane, instead of one per field. All
+  fields must have the same shape and representation.
+
+  Args:
+    z_lists: A sequence of fields. Each field is either a list of length nz of
+      tensors of shape (nx, ny), or a 3D tensor of shape (nz, nx, ny).
+    dims: The dimensions or axes along which halo exchange will be performed.
+    replica_id: The replica id.
+    replicas: A numpy array of replicas.
+    replica_dims: The dimensions of `replicas` along which halo exchange will be
+      performed.
+    periodic_dims: If not `None`, must be a boolean vector with the same length
+      as replica_dims. Indicates whether the particular dimension uses periodic
+      boundary conditions.
+    boundary_conditions: A sequence with the boundary conditions of each field
+      in `z_lists`, each following the format in `inplace_halo_exchange`. If
+      `None`, the boundaries of all fields will be set to 0.
+    width: The width of halo to exchange.
+
+  Returns:
+    A list with the fields in `z_lists` modified to include the result of halo
+    exchange and taking boundary conditions into account.
+  """
+  n_fields = len(z_lists)
+  if not n_fields:
+    return []
+
+  periodic_dims = periodic_dims or [None] * len(dims)
+  boundary_conditions = boundary_conditions or [None] * n_fields
+  boundary_conditions = [
+      bc or [[None, None]] * len(dims) for bc in boundary_conditions
+  ]
+
+  assert len(boundary_conditions) == n_fields
+  assert len(dims) == len(replica_dims)
+  assert len(dims) == len(periodic_dims)
+
+  is_z_list_3d = not isinstance(z_lists[0], Sequence)
+  if is_z_list_3d:
+    z_lists = [tf.unstack(z_list) for z_list in z_lists]
+  else:
+    z_lists = list(z_lists)
+
+  with tf.name_scope("HaloExchangeBatched"):
+    for i, (dim, replica_dim, periodic) in enumerate(
+        zip(dims, replica_dims, periodic_dims)):
+      bcs = []
+      for z_list, bc in zip(z_lists, boundary_conditions):
+        assert len(dims) == len(bc)
+        bc_low, bc_high = bc[i] if bc[i] else (None, None)
+        if is_z_list_3d:
+          bc_low = _update_to_2d_list(bc_low, dim, width)
+          bc_high = _update_to_2d_list(bc_high, dim, width)
+        _validate_boundary_condition(bc_low, z_list, dim, width)
+        _validate_boundary_condition(bc_high, z_list, dim, width)
+        bcs.append((bc_low, bc_high))
+
+      is_first = halo_exchange_utils.is_first_replica(replica_id, replicas,
+                                                      replica_dim)
+      # Planes are exchanged from innermost to outermost, which is required by
+      # the Neumann boundary conditions. See `inplace_halo_exchange`.
+      for plane in range(width - 1, -1, -1):
+        halos_from_self = [
+            _halos_from_self(z_list, dim, plane, width, is_first, 0)
+            for z_list in z_lists
+        ]
+        high_halos, low_halos = _do_exchange(
+            replicas, replica_dim,
+            tf.stack([halos[0] for halos in halos_from_self]),
+            tf.stack([halos[1] for halos in halos_from_self]), bool(periodic))
+        high_halos = tf.unstack(high_halos)
+        low_halos = tf.unstack(low_halos)
+
+        for j in range(n_fields):
+          bc_low_plane, bc_high_plane = _bc_planes(bcs[j][0], bcs[j][1], plane,
+                                                   width)
+          z_lists[j] = _inplace_halo_exchange_1d(
+              z_lists[j], dim, replica_id, replicas, replica_dim,
+              bool(periodic), bc_low_plane, bc_high_plane, width, plane, 0,
+              halos_from_neighbor=(high_halos[j], low_halos[j]))
+
+    if is_z_list_3d:
+      z_lists = [tf.stack(z_list) for z_list in z_lists]
+
+    return z_lists
+
+
+def _bc_planes(bc_low, bc_high, plane, width):
+  """Selects the boundary conditions for a single `plane` in the halo."""
+  if bc_low:
+    # Create a mutable copy of the bc passed in.
+    bc_low_plane = list(bc_low)
+    # If the boundary condition is a list of planes select the relevant one.
+    bc_low_plane[1] = (
+        bc_low_plane[1]
+        if isinstance(bc_low_plane[1], float) else bc_low_plane[1][plane])
+  else:
+    bc_low_plane = None
+  if bc_high:
+    # Create a mutable copy of the bc passed in.
+    bc_high_plane = list(bc_high)
+    # If the boundary condition is a list of planes select the relevant one.
+    bc_high_plane[1] = (
+        bc_high_plane[1] if isinstance(bc_high_plane[1], float) else
+        bc_high_plane[1][width - plane - 1])
+  else:
+    bc_high_plane = None
+  return bc_low_plane, bc_high_plane
+
+
 def _validate_boundary_condition(bc, z_list, dim, width):
   """Checks the validity of the boundary condition.
 
@@ -0,0 +1,130 @@
+# Copyright 2023 The swirl_lm Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for halo_exchange."""
+
+import numpy as np
+from swirl_lm.communication import halo_exchange
+from swirl_lm.utility import tpu_util
+import tensorflow as tf
+
+BCType = halo_exchange.BCType
+
+_WIDTH = 2
+_DIMS = (0, 1, 2)
+_REPLICA_DIMS = (0, 1, 2)
+
+
+def _fields(seed):
+  """Returns three random 3D fields of shape (nz, nx, ny)."""
+  rng = np.random.RandomState(seed)
+  return [
+      tf.constant(rng.uniform(size=(8, 8, 8)), dtype=tf.float32)
+      for _ in range(3)
+  ]
+
+
+def _boundary_conditions():
+  """Returns a different boundary condition for each field."""
+  dirichlet = [[(BCType.DIRICHLET, 1.0)] * 2] * 3
+  neumann = [[(BCType.NEUMANN, 0.5)] * 2] * 3
+  mixed = [
+      [(BCType.NEUMANN_2, 0.0), (BCType.DIRICHLET, -1.0)],
+      [(BCType.DIRICHLET, 2.0), (BCType.NEUMANN, 0.0)],
+      [(BCType.NEUMANN, 0.0), (BCType.NEUMANN_2, 0.0)],
+  ]
+  return [dirichlet, neumann, mixed]
+
+
+def _exchange_separately(fields, replica_id, replicas, periodic_dims):
+  return [
+      halo_exchange.inplace_halo_exchange(
+          f, _DIMS, replica_id, replicas, _REPLICA_DIMS, periodic_dims, bc,
+          _WIDTH)
+      for f, bc in zip(fields, _boundary_conditions())
+  ]
+
+
+def _exchange_batched(fields, replica_id, replicas, periodic_dims):
+  return halo_exchange.inplace_halo_exchange_batched(
+      fields, _DIMS, replica_id, replicas, _REPLICA_DIMS, periodic_dims,
+      _boundary_conditions(), _WIDTH)
+
+
+def _tpu_strategy(computation_shape):
+  """Returns a `TPUStrategy` with `computation_shape` cores, or `None`."""
+  try:
+    resolver = tf.distribute.cluster_resolver.TPUClusterResolver(tpu='')
+    tf.config.experimental_connect_to_cluster(resolver)
+    topology = tf.tpu.experimental.initialize_tpu_system(resolver)
+  except (ValueError, tf.errors.OpError):
+    return None
+  if topology.num_tasks * topology.num_tpus_per_task < np.prod(
+      computation_shape):
+    return None
+  device_assignment, _ = tpu_util.tpu_device_assignment(
+      computation_shape=computation_shape, tpu_topology=topology)
+  return tf.distribute.TPUStrategy(
+      resolver, experimental_device_assignment=device_assignment)
+
+
+class HaloExchangeTest(tf.test.TestCase):
+
+  def testBatchedMatchesSeparateExchangeOnSingleReplica(self):
+    """Batched exchange matches exchanging each field on its own."""
+    replica_id = tf.constant(0)
+    replicas = np.array([[[0]]])
+    fields = _fields(seed=1)
+
+    for periodic_dims in ([False] * 3, [True, False, True]):
+      with self.subTest(periodic_dims=periodic_dims):
+        expected = _exchange_separately(
+            fields, replica_id, replicas, periodic_dims)
+        batched = _exchange_batched(fields, replica_id, replicas, periodic_dims)
+
+        self.assertLen(batched, len(expected))
+        for e, b in zip(expected, batched):
+          self.assertAllClose(e, b)
+
+  def testBatchedMatchesSeparateExchangeOnMultipleReplicas(self):
+    """Batched exchange matches separate exchanges with 2 x 1 x 1 replicas."""
+    computation_shape = np.array([2, 1, 1])
+    strategy = _tpu_strategy(computation_shape)
+    if strategy is None:
+      self.skipTest('Exchanging halos between replicas requires 2 TPU cores.')
+
+    replicas = np.array([[[0]], [[1]]])
+    periodic_dims = [True, False, False]
+    per_replica_fields = [_fields(seed=i) for i in range(2)]
+    fields = strategy.experimental_distribute_values_from_function(
+        lambda ctx: per_replica_fields[ctx.replica_id_in_sync_group])
+
+    def step_fn(fields):
+      replica_id = tf.distribute.get_replica_context().replica_id_in_sync_group
+      return (
+          _exchange_separately(fields, replica_id, replicas, periodic_dims),
+          _exchange_batched(fields, replica_id, replicas, periodic_dims),
+      )
+
+    expected, batched = tf.function(
+        lambda: strategy.run(step_fn, args=(fields,)))()
+
+    for e, b in zip(expected, batched):
+      self.assertAllClose(
+          strategy.experimental_local_results(e),
+          strategy.experimental_local_results(b))
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -20,7 +20,7 @@
 """
 
 import functools
-from typing import Optional, Text
+from typing import Dict, Optional, Sequence, Text
 
 import numpy as np
 from swirl_lm.base import parameters as parameters_lib
@@ -55,6 +55,157 @@ _KEY_V = common.KEY_V
 _KEY_W = common.KEY_W
 
 
+def _unpack_scalars(
+    packed: tf.Tensor,
+    names: Sequence[Text],
+    like: FlowFieldMap,
+) -> Dict[Text, FlowFieldVal]:
+  """Splits `packed` into scalars with the representations used in `like`."""
+  return {
+      name: common_ops.from_3d_tensor(sc, like[name])
+      for name, sc in zip(names, tf.unstack(packed, axis=0))
+  }
+
+
+@tf.function(jit_compile=True, reduce_retracing=True)
+def _cn_explicit_step(
+    phi_0: tf.Tensor,
+    rhs: tf.Tensor,
+    dt: float,
+    alpha: Optional[tf.Tensor] = None,
+) -> tf.Tensor:
+  """Advances a conservative variable by one explicit sub-iteration.
+
+  The update is purely pointwise, so it is compiled with XLA to fuse the
+  multiply-add chain into a single kernel. `dt` is a Python constant and is
+  therefore baked into the compiled function.
+
+  Args:
+    phi_0: The variable at the previous time step as a 3D tensor. It is
+      `rho * phi` in the low Mach number mode, and `phi` in the anelastic mode.
+    rhs: The right hand side of the transport equation for `rho * phi` as a 3D
+      tensor.
+    dt: The time step size.
+    alpha: The specific volume, i.e. `1 / rho`, as a 3D tensor. If provided,
+      `rhs` is scaled by it before the update, which is the case in the
+      anelastic mode.
+
+  Returns:
+    The variable `phi_0` advanced by `dt` as a 3D tensor.
+  """
+  if alpha is None:
+    return phi_0 + dt * rhs
+
+  return phi_0 + dt * rhs * alpha
+
+
+@tf.function(jit_compile=True, reduce_retracing=True)
+def _primitive_scalars(
+    rho_sc: Sequence[tf.Tensor],
+    rho: tf.Tensor,
+) -> tf.Tensor:
+  """Converts conservative scalars to primitive ones with a single division.
+
+  The packing and the division are compiled together with XLA so that the
+  packed conservative scalars are not materialized.
+
+  Args:
+    rho_sc: The conservative scalars `rho * phi`, each as a 3D tensor.
+    rho: The density as a 3D tensor.
+
+  Returns:
+    The primitive scalars packed along a leading axis of size `len(rho_sc)`.
+  """
+  return tf.stack(rho_sc, axis=0) / rho[tf.newaxis, ...]
+
+
+def _time_advance_cn_explicit_low_mach(
+    sc_name: Text,
+    rhs: tf.Tensor,
+    states_0: Dict[Text, tf.Tensor],
+    rho: tf.Tensor,
+    alpha_rho: Optional[tf.Tensor],
+    dt: float,
+) -> Dict[Text, tf.Tensor]:
+  """Advances `rho * sc_name` in time with the CN explicit iteration scheme.
+
+  Args:
+    sc_name: The name of the scalar.
+    rhs: The right hand side of the transport equation for `rho * sc_name` as a
+      3D tensor.
+    states_0: A dictionary that holds flow field variables from the previous
+      time step as 3D tensors. Must include `rho * sc_name`.
+    rho: The density at the current iteration as a 3D tensor.
+    alpha_rho: Not used in the low Mach number mode.
+    dt: The time step size.
+
+  Returns:
+    A dictionary with the updated scalar and `rho * sc_name` as 3D tensors.
+    Halos of the scalar are not updated.
+  """
+  del alpha_rho
+
+  rho_sc_name = 'rho_{}'.format(sc_name)
+  rho_sc = _cn_explicit_step(states_0[rho_sc_name], rhs, dt)
+  # Updates scalar, to be consistent with rho * scalar.
+  return {rho_sc_name: rho_sc, sc_name: rho_sc / rho}
+
+
+def _time_advance_cn_explicit_anelastic(
+    sc_name: Text,
+    rhs: tf.Tensor,
+    states_0: Dict[Text, tf.Tensor],
+    rho: tf.Tensor,
+    alpha_rho: tf.Tensor,
+    dt: float,
+) -> Dict[Text, tf.Tensor]:
+  """Advances `sc_name` in time with the CN explicit iteration scheme.
+
+  Args:
+    sc_name: The name of the scalar.
+    rhs: The right hand side of the transport equation for `rho * sc_name` as a
+      3D tensor.
+    states_0: A dictionary that holds flow field variables from the previous
+      time step as 3D tensors. Must include `sc_name`.
+    rho: Not used in the anelastic mode.
+    alpha_rho: The specific volume as a 3D tensor.
+    dt: The time step size.
+
+  Returns:
+    A dictionary with the updated scalar as a 3D tensor. Halos of the scalar are
+    not updated.
+  """
+  del rho
+
+  return {sc_name: _cn_explicit_step(states_0[sc_name], rhs, dt, alpha_rho)}
+
+
+def _ib_forcing_noop(
+    replica_id: tf.Tensor,
+    replicas: np.ndarray,
+    scalar_name: Text,
+    rhs: tf.Tensor,
+    phi: FlowFieldVal,
+    states: FlowFieldMap,
+    additional_states: FlowFieldMap,
+) -> tf.Tensor:
+  """Returns `rhs` unchanged when the IB does not add a forcing term."""
+  del replica_id, replicas, scalar_name, phi, states, additional_states
+  return rhs
+
+
+def _ib_states_noop(
+    replica_id: tf.Tensor,
+    replicas: np.ndarray,
+    states: FlowFieldMap,
+    additional_states: FlowFieldMap,
+    boundary_conditions: Dict[Text, halo_exchange.BoundaryConditionsSpec],
+) -> FlowFieldMap:
+  """Returns `states` unchanged when no IB is applied."""
+  del replica_id, replicas, additional_states, boundary_conditions
+  return states
+
+
 class Scalars(object):
   """A library for solving scalar transport equations."""
 
@@ -90,15 +241,18 @@ class Scalars(object):
     self._bc = {
         varname: bc_val
         for varname, bc_val in self._params.bc.items()
-        if varname in self._params.transport_scalars_names
+        if varname in self._params.transport_scalars_set
     }
 
     self._source = {
-        sc.name: None for sc in self._params.scalars if sc.solve_scalar
+        sc_name: None for sc_name in self._params.transport_scalars_names
     }
 
     self._ib = ib if ib is not None else (
         immersed_boundary_method.immersed_boundary_method_factory(self._params))
+    # Only the direct forcing methods modify the right hand side with the
+    # scalar values, so `rho * phi` is not computed for the other IB types.
+    self._ib_updates_forcing = self._ib is not None and self._ib.updates_forcing
 
     self._dbg = dbg
 
@@ -125,6 +279,37 @@ class Scalars(object):
           }
       )
 
+    # Options that are fixed for the lifetime of this object are resolved here,
+    # so that the step functions are traced without branching on them.
+    self._is_anelastic = (
+        self._params.solver_mode == thermodynamics_pb2.Thermodynamics.ANELASTIC)
+    if self._ib_updates_forcing:
+      self._apply_ib_forcing = self._ib_update_forcing
+    else:
+      self._apply_ib_forcing = _ib_forcing_noop
+    if self._ib is not None:
+      self._apply_ib_states = functools.partial(self._ib.update_states,
+                                                self._kernel_op)
+    else:
+      self._apply_ib_states = _ib_states_noop
+
+    # Resolve the time integration scheme of all scalars once, so that no
+    # dispatch is required when the step is traced.
+    time_advance_cn_explicit = (
+        _time_advance_cn_explicit_anelastic
+        if self._is_anelastic else _time_advance_cn_explicit_low_mach)
+    self._time_advance_fn = {}
+    for scalar_name in self._params.transport_scalars_names:
+      time_scheme = self._params.scalar_time_integration_scheme(scalar_name)
+      if (time_scheme ==
+          numerics_pb2.TimeIntegrationScheme.TIME_SCHEME_CN_EXPLICIT_ITERATION):
+        self._time_advance_fn[scalar_name] = functools.partial(
+            time_advance_cn_explicit, dt=self._params.dt)
+      else:
+        raise ValueError(
+            'Time integration scheme %s is not supported yet for scalars.' %
+            time_scheme)
+
   def _exchange_halos(self, f, bc_f, replica_id, replicas):
     """Performs halo exchange for the variable f."""
     return halo_exchange.inplace_halo_exchange(
@@ -137,6 +322,25 @@ class Scalars(object):
         bc_f,
         width=self._params.halo_width)
 
+  def _exchange_halos_batched(
+      self,
+      fields: FlowFieldMap,
+      replica_id: tf.Tensor,
+      replicas: np.ndarray,
+  ) -> FlowFieldMap:
+    """Performs halo exchange for all scalars in `fields` at once."""
+    names = list(fields.keys())
+    exchanged = halo_exchange.inplace_halo_exchange_batched(
+        [fields[name] for name in names],
+        self._halo_dims,
+        replica_id,
+        replicas,
+        self._replica_dims,
+        self._params.periodic_dims,
+        [self._bc[name] for name in names],
+        width=self._params.halo_width)
+    return dict(zip(names, exchanged))
+
   def exchange_scalar_halos(
       self,
       f: FlowFieldVal,
@@ -171,7 +375,7 @@ class Scalars(object):
       scalar_name: Text,
       states: FlowFieldMap,
       additional_states: FlowFieldMap,
-      dbg: bool = False,
+      terms: Optional[Dict[Text, FlowFieldVal]] = None,
   ):
     """Provides a function that computes the RHS function of a generic scalar.
 
@@ -189,19 +393,15 @@ class Scalars(object):
         'rho', 'u', 'v', 'w'.
       additional_states: Helper states that are required by the scalar transport
         equation. Must contain 'diffusivity'.
-      dbg: A flag of whether to use the debug mode. If `True`, the returned RHS
-        function returns the convection terms, the diffusion terms, and the
-        external source term instead of the sum of all these terms (i.e. the
-        actual RHS term).
+      terms: An optional dictionary for the debug mode. If provided, the
+        returned RHS function also stores the convection terms, the diffusion
+        terms, and the external source term in it, so that these terms are
+        available without evaluating them a second time.
 
     Returns:
-      scalar_function: A function that computes the `f(phi)`.
+      scalar_function: A function that computes the `f(phi)` as a 3D tensor.
     """
-    source = (
-        self._source[scalar_name]
-        if self._source[scalar_name] is not None
-        else tf.nest.map_structure(tf.zeros_like, states[_KEY_RHO])
-    )
+    source = self._source[scalar_name]
 
     def scalar_function(phi: FlowFieldVal):
       """Computes the functional RHS for the three momentum equations.
@@ -210,8 +410,7 @@ class Scalars(object):
         phi: The scalar field.
 
       Returns:
-        A `FlowFieldVal` representing the RHS of the scalar transport
-        equation.
+        A 3D tensor representing the RHS of the scalar transport equation.
       """
       conv = self._scalar_model[scalar_name].convection_fn(
           replica_id, replicas, phi, states, additional_states
@@ -225,10 +424,17 @@ class Scalars(object):
           replica_id, replicas, phi, states, additional_states
       )
 
-      source_all = tf.nest.map_structure(tf.math.add, source, source_additional)
+      # The external source is added only if it's provided, which avoids
+      # allocating and adding a field of zeros at every step.
+      if source is None:
+        source_all = source_additional
+      else:
+        source_all = tf.nest.map_structure(
+            tf.math.add, source, source_additional
+        )
 
-      if dbg:
-        return {
+      if terms is not None:
+        terms.update({
             'conv_x': conv[0],
             'conv_y': conv[1],
             'conv_z': conv[2],
@@ -236,47 +442,57 @@ class Scalars(object):
             'diff_y': diff[1],
             'diff_z': diff[2],
             'source': source_all,
-        }
-
-      def scalar_transport_equation(
-          conv_x, conv_y, conv_z, diff_x, diff_y, diff_z, src
-      ):
-        """Defines right-hand side function of a scalar transport equation."""
-        return -(conv_x + conv_y + conv_z) + (diff_x + diff_y + diff_z) + src
-
-      rhs = tf.nest.map_structure(
-          scalar_transport_equation,
-          conv[0],
-          conv[1],
-          conv[2],
-          diff[0],
-          diff[1],
-          diff[2],
-          source_all,
+        })
+
+      # The right-hand side of the scalar transport equation, evaluated on the
+      # whole field at once instead of slice by slice. The sums of the fluxes
+      # are computed with `add_n` so that each is a single reduction op. It's
+      # kept as a 3D tensor for the time advancement.
+      rhs = (
+          tf.math.add_n([common_ops.to_3d_tensor(diff_i) for diff_i in diff]
+                        + [common_ops.to_3d_tensor(source_all)])
+          - tf.math.add_n([common_ops.to_3d_tensor(conv_i) for conv_i in conv])
       )
 
-      if self._ib is not None:
-        rho_sc_name = 'rho_{}'.format(scalar_name)
-        rhs_name = self._ib.ib_rhs_name(rho_sc_name)
-        helper_states = {rhs_name: rhs}
-        for helper_var_name in ('ib_interior_mask', 'ib_boundary'):
-          if helper_var_name in additional_states:
-            helper_states[helper_var_name] = additional_states[
-                helper_var_name
-            ]
-
-        rhs_ib_updated = self._ib.update_forcing(
-            self._kernel_op, replica_id, replicas, {
-                rho_sc_name:
-                    tf.nest.map_structure(tf.math.multiply, states[_KEY_RHO],
-                                          phi)
-            }, helper_states)
-        rhs = rhs_ib_updated[rhs_name]
-
-      return rhs
+      return self._apply_ib_forcing(replica_id, replicas, scalar_name, rhs,
+                                    phi, states, additional_states)
 
     return scalar_function
 
+  def _ib_update_forcing(
+      self,
+      replica_id: tf.Tensor,
+      replicas: np.ndarray,
+      scalar_name: Text,
+      rhs: tf.Tensor,
+      phi: FlowFieldVal,
+      states: FlowFieldMap,
+      additional_states: FlowFieldMap,
+  ) -> tf.Tensor:
+    """Updates the RHS of `rho * scalar_name` with the IB direct forcing.
+
+    The IB methods take the fields in the representation of `phi`, so the 3D
+    tensor `rhs` is converted to it and back.
+    """
+    rho_sc_name = 'rho_{}'.format(scalar_name)
+    rhs_name = self._ib.ib_rhs_name(rho_sc_name)
+    helper_states = {rhs_name: common_ops.from_3d_tensor(rhs, phi)}
+    for helper_var_name in ('ib_interior_mask', 'ib_boundary'):
+      if helper_var_name in additional_states:
+        helper_states[helper_var_name] = additional_states[helper_var_name]
+
+    rhs_ib_updated = self._ib.update_forcing(
+        self._kernel_op, replica_id, replicas,
+        {
+            rho_sc_name: common_ops.from_3d_tensor(
+                common_ops.to_3d_tensor(states[_KEY_RHO])
+                * common_ops.to_3d_tensor(phi),
+                phi,
+            )
+        },
+        helper_states)
+    return common_ops.to_3d_tensor(rhs_ib_updated[rhs_name])
+
   def prestep(
       self,
       replica_id: tf.Tensor,
@@ -329,23 +545,43 @@ class Scalars(object):
     Returns:
       The predicted scalars and all debugging terms (if required).
     """
-    exchange_halos = functools.partial(
-        self.exchange_scalar_halos, replica_id=replica_id, replicas=replicas)
-
-    states_mid = {}
-    states_mid.update(states)
-    states_mid.update(
-        {_KEY_RHO: common_ops.average(states[_KEY_RHO], states_0[_KEY_RHO])})
-    states_mid.update(
-        {'rho_thermal': common_ops.average(states['rho_thermal'],
-                                           states_0['rho_thermal'])})
-
-    for sc_name in self._params.transport_scalars_names:
-      states_mid.update(
-          {sc_name: common_ops.average(states[sc_name], states_0[sc_name])})
-
-    updated_scalars = {}
-    for sc_name in self._params.transport_scalars_names:
+    # Each field used in the update is converted to a 3D tensor only once per
+    # step, and the updated fields are kept as 3D tensors until the halo
+    # exchange.
+    sc_names = self._params.transport_scalars_names
+    mid_names = [_KEY_RHO, 'rho_thermal'] + sc_names
+    states_3d = {name: common_ops.to_3d_tensor(states[name])
+                 for name in mid_names}
+    states_0_3d = {name: common_ops.to_3d_tensor(states_0[name])
+                   for name in mid_names}
+    if not self._is_anelastic:
+      states_0_3d.update({
+          'rho_{}'.format(sc_name):
+              common_ops.to_3d_tensor(states_0['rho_{}'.format(sc_name)])
+          for sc_name in sc_names
+      })
+
+    # The mid-point values are computed before the update of any scalar
+    # because the source terms of some scalars depend on the mid-point values
+    # of the others, e.g. 'theta' on 'q_t'. They are converted back to the
+    # representation of `states`, which is what the scalar models take.
+    states_mid = dict(states)
+    for name in mid_names:
+      states_mid[name] = common_ops.from_3d_tensor(
+          0.5 * (states_3d[name] + states_0_3d[name]), states[name]
+      )
+
+    # The specific volume in the anelastic mode is shared by all scalars, so
+    # it's computed only once per step.
+    rho = states_3d[_KEY_RHO]
+    if self._is_anelastic:
+      alpha_rho = tf.math.reciprocal(rho)
+    else:
+      alpha_rho = None
+
+    updated_scalars_3d = {}
+    debug_terms = {}
+    for sc_name in sc_names:
       sc_mid = states_mid[sc_name]
       if self._use_sgs:
         diff_t = self._sgs_model.turbulent_diffusivity(
@@ -355,68 +591,47 @@ class Scalars(object):
             self._params.diffusivity(sc_name) + diff_t_i for diff_t_i in diff_t
         ]
       else:
-        diffusivity = tf.nest.map_structure(
-            lambda sc: self._params.diffusivity(sc_name) * tf.ones_like(sc),  # pylint: disable=cell-var-from-loop
-            sc_mid,
+        # The molecular diffusivity is uniform, so it's kept as a scalar and
+        # broadcast in the diffusion term.
+        diffusivity = tf.constant(
+            self._params.diffusivity(sc_name),
+            dtype=tf.nest.flatten(sc_mid)[0].dtype,
         )
       helper_states = {'diffusivity': diffusivity}
       helper_states.update(additional_states)
+      terms = {} if self._dbg is not None else None
       scalar_rhs_fn = self._scalar_update(replica_id, replicas, sc_name,
-                                          states_mid, helper_states)
-
-      def time_advance_cn_explicit(rhs, sc_name):
-        updated_vars = {}
-        if (self._params.solver_mode ==
-            thermodynamics_pb2.Thermodynamics.ANELASTIC):
-          alpha = tf.nest.map_structure(tf.math.reciprocal, states[_KEY_RHO])
-          new_sc = tf.nest.map_structure(
-              lambda sc, b, a: sc + self._params.dt * b * a, states_0[sc_name],
-              rhs, alpha)
-          updated_vars.update({sc_name: exchange_halos(new_sc, sc_name)})
-        else:
-          new_sc = tf.nest.map_structure(lambda a, b: a + self._params.dt * b,
-                                         states_0['rho_{}'.format(sc_name)],
-                                         rhs)
-          updated_vars.update({'rho_{}'.format(sc_name): new_sc})
-
-          # Updates scalar, to be consistent with rho * scalar.
-          updated_vars.update({
-              sc_name:
-                  exchange_halos(
-                      tf.nest.map_structure(
-                          tf.math.divide,
-                          updated_vars['rho_{}'.format(sc_name)],
-                          states[_KEY_RHO]), sc_name),
-          })
-        return updated_vars
+                                          states_mid, helper_states, terms)
 
       # Time advancement for rho * scalar.
-      time_scheme = self._params.scalar_time_integration_scheme(sc_name)
-      if (time_scheme ==
-          numerics_pb2.TimeIntegrationScheme.TIME_SCHEME_CN_EXPLICIT_ITERATION):
-        updated_scalars.update(
-            time_advance_cn_explicit(scalar_rhs_fn(sc_mid), sc_name))
-      else:
-        raise ValueError(
-            'Time integration scheme %s is not supported yet for scalars.' %
-            time_scheme)
+      updated_scalars_3d.update(
+          self._time_advance_fn[sc_name](
+              sc_name, scalar_rhs_fn(sc_mid), states_0_3d, rho, alpha_rho
+          )
+      )
 
       if self._dbg is not None:
-        terms = (
-            self._scalar_update(replica_id, replicas, sc_name, states_mid,
-                                helper_states, True)(sc_mid))
         diff_t = diff_t if self._use_sgs else None
-        updated_scalars.update(
+        debug_terms.update(
             self._dbg.update_scalar_terms(sc_name, terms, diff_t))
 
+    # The updated fields are converted back to the representation of the
+    # states once. Halos of all updated scalars are exchanged together so that
+    # the communication is shared among scalars.
+    updated_scalars = {
+        name: common_ops.from_3d_tensor(val, states_0[name])
+        for name, val in updated_scalars_3d.items()
+    }
+    updated_scalars.update(
+        self._exchange_halos_batched(
+            {sc_name: updated_scalars[sc_name] for sc_name in sc_names},
+            replica_id, replicas))
+    updated_scalars.update(debug_terms)
+
     # Applies the marker-and-cell or Cartesian grid method if requested in the
     # config file.
-    if self._ib is not None:
-      updated_scalars = self._ib.update_states(self._kernel_op, replica_id,
-                                               replicas, updated_scalars,
-                                               additional_states, self._bc)
-
-    return updated_scalars  # pytype: disable=bad-return-type
+    return self._apply_ib_states(  # pytype: disable=bad-return-type
+        replica_id, replicas, updated_scalars, additional_states, self._bc)
 
   def correction_step(
       self,
@@ -443,24 +658,28 @@ class Scalars(object):
     """
     del states_0
 
-    exchange_halos = functools.partial(
-        self.exchange_scalar_halos, replica_id=replica_id, replicas=replicas)
-
-    scalars = {}
-
-    for sc_name in self._params.transport_scalars_names:
-      sc_buf = tf.nest.map_structure(tf.math.divide,
-                                     states['rho_{}'.format(sc_name)],
-                                     states[_KEY_RHO])
-
-      # Applies the marker-and-cell or Cartesian grid method if requested in the
-      # config file. Halo exchange will be performed after the solid boundary
-      # condition is applied.
-      if self._ib is not None:
-        sc_buf = self._ib.update_states(self._kernel_op, replica_id, replicas,
-                                        {sc_name: sc_buf}, additional_states,
-                                        self._bc)[sc_name]
+    sc_names = self._params.transport_scalars_names
+    if not sc_names:
+      return {}
+
+    # The conservative scalars are packed along a leading scalar axis so that
+    # all of them are converted to primitive scalars with a single division.
+    scalars = _unpack_scalars(
+        _primitive_scalars(
+            [
+                common_ops.to_3d_tensor(states['rho_{}'.format(sc_name)])
+                for sc_name in sc_names
+            ],
+            common_ops.to_3d_tensor(states[_KEY_RHO]),
+        ),
+        sc_names,
+        states,
+    )
 
-      scalars.update({sc_name: exchange_halos(sc_buf, sc_name)})
+    # Applies the marker-and-cell or Cartesian grid method if requested in the
+    # config file. Halo exchange will be performed after the solid boundary
+    # condition is applied.
+    scalars = self._apply_ib_states(replica_id, replicas, scalars,
+                                    additional_states, self._bc)
 
-    return scalars
+    return self._exchange_halos_batched(scalars, replica_id, replicas)
@@ -0,0 +1,238 @@
+# Copyright 2023 The swirl_lm Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for scalars."""
+
+import itertools
+
+import numpy as np
+from swirl_lm.base import parameters
+from swirl_lm.boundary_condition import immersed_boundary_method
+from swirl_lm.equations import scalars
+from swirl_lm.equations.source_function import scalar_generic
+from swirl_lm.physics.thermodynamics import thermodynamics_manager
+from swirl_lm.physics.thermodynamics import thermodynamics_pb2
+from swirl_lm.utility import common_ops
+from swirl_lm.utility import get_kernel_fn
+from swirl_lm.utility import grid_parametrization_pb2
+import tensorflow as tf
+
+from google.protobuf import text_format
+
+_GRID = """
+    computation_shape { dim_0: 1 dim_1: 1 dim_2: 1 }
+    length { dim_0: 1.0 dim_1: 1.0 dim_2: 1.0 }
+    grid_size { dim_0: 8 dim_1: 8 dim_2: 8 }
+    halo_width: 2
+    dt: 0.01
+    kernel_size: 8
+"""
+
+_CONFIG = """
+    solver_procedure: VARIABLE_DENSITY
+    convection_scheme: CONVECTION_SCHEME_QUICK
+    time_integration_scheme: TIME_SCHEME_CN_EXPLICIT_ITERATION
+    periodic {{ dim_0: true dim_1: true dim_2: true }}
+    kinematic_viscosity: 1e-3
+    scalars {{ name: "Y_O" diffusivity: 1e-3 density: 1.0 }}
+    scalars {{ name: "Z" diffusivity: 2e-3 density: 1.0 }}
+    thermodynamics {{ solver_mode: {solver_mode} constant_density {{}} }}
+    use_3d_tf_tensor: {use_3d_tf_tensor}
+"""
+
+_IB_CONFIG = """
+    boundary_models {
+      ib {
+        direct_forcing {
+          variables { name: "rho_Y_O" value: 0.5 }
+          variables { name: "rho_Z" value: 1.0 }
+        }
+      }
+    }
+"""
+
+_STATE_KEYS = (
+    'u', 'v', 'w', 'rho_u', 'rho_v', 'rho_w', 'p', 'rho', 'rho_thermal', 'Y_O',
+    'Z', 'rho_Y_O', 'rho_Z',
+)
+
+
+def _params(solver_mode, use_3d_tf_tensor, with_ib):
+  """Creates the parameters of a periodic flow with two scalars."""
+  config = _CONFIG.format(
+      solver_mode=solver_mode, use_3d_tf_tensor=str(use_3d_tf_tensor).lower()
+  )
+  if with_ib:
+    config += _IB_CONFIG
+  grid = text_format.Parse(
+      _GRID, grid_parametrization_pb2.GridParametrization()
+  )
+  return parameters.SwirlLMParameters.config_from_text_proto(config, grid)
+
+
+def _random_fields(seed):
+  """Returns random 3D states, and the helper states of the IB."""
+  rng = np.random.RandomState(seed)
+
+  def field(low=0.5, high=1.5):
+    return tf.constant(rng.uniform(low, high, (8, 8, 8)), dtype=tf.float32)
+
+  states = {key: field() for key in _STATE_KEYS}
+  states_0 = {key: field() for key in _STATE_KEYS}
+  mask = tf.constant(
+      rng.uniform(size=(8, 8, 8)) > 0.2, dtype=tf.float32
+  )
+  return states, states_0, {'ib_interior_mask': mask}
+
+
+def _reference_prediction_step(
+    params, kernel_op, model, replica_id, replicas, states, states_0,
+    additional_states,
+):
+  """Predicts the scalars slice by slice, as done before fields were stacked."""
+  thermodynamics = thermodynamics_manager.thermodynamics_factory(params)
+  ib = immersed_boundary_method.immersed_boundary_method_factory(params)
+  sc_names = params.transport_scalars_names
+  is_anelastic = (
+      params.solver_mode == thermodynamics_pb2.Thermodynamics.ANELASTIC
+  )
+
+  states_mid = dict(states)
+  for name in ['rho', 'rho_thermal'] + sc_names:
+    states_mid[name] = common_ops.average(states[name], states_0[name])
+
+  updated = {}
+  for sc_name in sc_names:
+    scalar_model = scalar_generic.ScalarGeneric(
+        kernel_op, params, sc_name, thermodynamics
+    )
+    phi = states_mid[sc_name]
+    helper_states = {
+        'diffusivity': tf.nest.map_structure(
+            lambda f: params.diffusivity(sc_name) * tf.ones_like(f),  # pylint: disable=cell-var-from-loop
+            phi,
+        )
+    }
+    helper_states.update(additional_states)
+    args = (replica_id, replicas, phi, states_mid, helper_states)
+    conv = scalar_model.convection_fn(*args)
+    diff = scalar_model.diffusion_fn(*args)
+    source = scalar_model.source_fn(*args)
+    rhs = tf.nest.map_structure(
+        lambda cx, cy, cz, dx, dy, dz, s: -(cx + cy + cz) + (dx + dy + dz) + s,
+        *conv, *diff, source,
+    )
+
+    rho_sc_name = 'rho_{}'.format(sc_name)
+    if ib is not None:
+      rhs_name = ib.ib_rhs_name(rho_sc_name)
+      rhs = ib.update_forcing(
+          kernel_op, replica_id, replicas,
+          {
+              rho_sc_name: tf.nest.map_structure(
+                  tf.math.multiply, states_mid['rho'], phi
+              )
+          },
+          {
+              rhs_name: rhs,
+              'ib_interior_mask': additional_states['ib_interior_mask'],
+          },
+      )[rhs_name]
+
+    if is_anelastic:
+      new_sc = tf.nest.map_structure(
+          lambda sc, b, rho: sc + params.dt * b * tf.math.reciprocal(rho),
+          states_0[sc_name], rhs, states['rho'],
+      )
+    else:
+      updated[rho_sc_name] = tf.nest.map_structure(
+          lambda a, b: a + params.dt * b, states_0[rho_sc_name], rhs
+      )
+      new_sc = tf.nest.map_structure(
+          tf.math.divide, updated[rho_sc_name], states['rho']
+      )
+    updated[sc_name] = model.exchange_scalar_halos(
+        new_sc, sc_name, replica_id, replicas
+    )
+  return updated
+
+
+class ScalarsTest(tf.test.TestCase):
+
+  def testPredictionAndCorrectionMatchSliceBySliceReference(self):
+    """Stacked updates match the slice-by-slice baseline in all modes."""
+    replica_id = tf.constant(0)
+    replicas = np.array([[[0]]])
+    kernel_op = get_kernel_fn.ApplyKernelConvOp(4)
+    states, states_0, ib_states = _random_fields(seed=7)
+    to_list = lambda f: tf.unstack(f, axis=0)
+
+    for solver_mode, use_3d_tf_tensor, with_ib in itertools.product(
+        ('LOW_MACH', 'ANELASTIC'), (False, True), (False, True)
+    ):
+      with self.subTest(
+          solver_mode=solver_mode,
+          use_3d_tf_tensor=use_3d_tf_tensor,
+          with_ib=with_ib,
+      ):
+        params = _params(solver_mode, use_3d_tf_tensor, with_ib)
+        model = scalars.Scalars(kernel_op, params)
+        additional_states = ib_states if with_ib else {}
+        model.prestep(replica_id, replicas, additional_states)
+
+        # The reference is always evaluated on lists of z-slices.
+        expected = _reference_prediction_step(
+            params, kernel_op, model, replica_id, replicas,
+            tf.nest.map_structure(to_list, states),
+            tf.nest.map_structure(to_list, states_0),
+            tf.nest.map_structure(to_list, additional_states),
+        )
+        convert = (lambda f: f) if use_3d_tf_tensor else to_list
+        predicted = model.prediction_step(
+            replica_id, replicas,
+            tf.nest.map_structure(convert, states),
+            tf.nest.map_structure(convert, states_0),
+            tf.nest.map_structure(convert, additional_states),
+        )
+
+        self.assertCountEqual(expected.keys(), predicted.keys())
+        for name in expected:
+          self.assertEqual(use_3d_tf_tensor,
+                           isinstance(predicted[name], tf.Tensor))
+          self.assertAllClose(
+              common_ops.to_3d_tensor(expected[name]),
+              common_ops.to_3d_tensor(predicted[name]),
+              rtol=1e-5,
+              atol=1e-5,
+          )
+
+        # The correction divides the conservative scalars by the density.
+        corrected = model.correction_step(
+            replica_id, replicas,
+            tf.nest.map_structure(convert, states), {},
+            tf.nest.map_structure(convert, additional_states),
+        )
+        for sc_name in params.transport_scalars_names:
+          expected_sc = model.exchange_scalar_halos(
+              states['rho_{}'.format(sc_name)] / states['rho'], sc_name,
+              replica_id, replicas,
+          )
+          self.assertAllClose(
+              expected_sc, common_ops.to_3d_tensor(corrected[sc_name]),
+              rtol=1e-5,
+          )
+
+
+if __name__ == '__main__':
+  tf.test.main()
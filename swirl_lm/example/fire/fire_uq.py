@@ -75,7 +75,19 @@ class FireUQSampler:
   def __init__(self):
     self.sampler = np.random.default_rng(_RANDOM_SEED_UQ.value)
     self.start_id = _UQ_START_ID.value
-    if _MODIFY_INDIVIDUAL.value:
+    # Flag values are read once here instead of on every call.
+    self._modify_individual = _MODIFY_INDIVIDUAL.value
+    self._read_uq_file = _READ_UQ_FILE.value
+    self._uq_filename = _UQ_FILENAME.value
+    self._n_samples = _N_SAMPLES_UQ.value
+    self._fuel_bed_height = _LARGE_SCALE_FUEL_BED_HEIGHT.value
+    self._lower_bounds = (
+      _FUEL_LOAD_LB.value, _MOISTURE_CONTENT_LB.value, _WIND_SPEED_LB.value
+    )
+    self._upper_bounds = (
+      _FUEL_LOAD_UB.value, _MOISTURE_CONTENT_UB.value, _WIND_SPEED_UB.value
+    )
+    if self._modify_individual:
       logging.warn(
         'Modifying uncertain parameters one at a time. Only generating 4'
         'trajectories (1 trajectory for baseline and 1 for each varied'
@@ -83,22 +95,33 @@ class FireUQSampler:
       )
     pass
 
-  def _uniform(self, lower_bound, upper_bound, n_samples):
+  def _uniform(self, lower_bounds, upper_bounds, n_samples):
     """
-    Returns random numbers sampled uniformly in [lower_bound, uppber_bound].
+    Returns random numbers sampled uniformly in [lower_bound, uppber_bound],
+    one row of `n_samples` values for each pair of bounds.
     We do not use `self.sampler.uniform` for compatibility with previous
-    version of random number generation.
+    version of random number generation. All rows are drawn at once, which
+    gives the same numbers as drawing them one row after another.
     """
-    norm_samples = self.sampler.random(size=(n_samples,), dtype=np.float32)
-    return (upper_bound - lower_bound) * norm_samples + lower_bound
+    lower_bounds = np.asarray(lower_bounds, dtype=np.float64)
+    upper_bounds = np.asarray(upper_bounds, dtype=np.float64)
+    norm_samples = self.sampler.random(
+      size=(len(lower_bounds), n_samples), dtype=np.float32
+    )
+    scale = (upper_bounds - lower_bounds).astype(np.float32)
+    offset = lower_bounds.astype(np.float32)
+    # The affine map is applied in place to avoid temporary arrays.
+    norm_samples *= scale[:, np.newaxis]
+    norm_samples += offset[:, np.newaxis]
+    return norm_samples
 
   def number_of_samples(self):
-    if _MODIFY_INDIVIDUAL.value:
+    if self._modify_individual:
       return 4
-    elif _READ_UQ_FILE.value:
+    elif self._read_uq_file:
       return 20
     else:
-      return _N_SAMPLES_UQ.value
+      return self._n_samples
 
   def generate_samples(self):
     """
@@ -107,40 +130,36 @@ class FireUQSampler:
     Returns:
       fuel_density_samples, moisture_density_samples, wind_speed_samples
     """
-    if _READ_UQ_FILE.value:
-      uq_values = np.load(_UQ_FILENAME.value)
-      fuel_density_samples = np.float32(uq_values[:, 0])
-      moisture_density_samples = np.float32(uq_values[:, 1])
-      wind_speed_samples = np.float32(uq_values[:, 2])
+    if self._read_uq_file:
+      uq_values = np.load(self._uq_filename, mmap_mode='r')
+      fuel_density_samples = uq_values[:, 0].astype(np.float32, copy=False)
+      moisture_density_samples = uq_values[:, 1].astype(np.float32, copy=False)
+      wind_speed_samples = uq_values[:, 2].astype(np.float32, copy=False)
     else:
-      if _MODIFY_INDIVIDUAL.value:
-        fuel_load_samples = np.ones(4) * _FUEL_LOAD_LB.value
-        fuel_load_samples[1] = _FUEL_LOAD_UB.value
-        fuel_density_samples = fuel_load_samples / _LARGE_SCALE_FUEL_BED_HEIGHT.value
-        moisture_content_samples = np.ones(4) * _MOISTURE_CONTENT_LB.value
-        moisture_content_samples[2] = _MOISTURE_CONTENT_UB.value
+      fuel_load_lb, moisture_content_lb, wind_speed_lb = self._lower_bounds
+      fuel_load_ub, moisture_content_ub, wind_speed_ub = self._upper_bounds
+      if self._modify_individual:
+        fuel_load_samples = np.ones(4) * fuel_load_lb
+        fuel_load_samples[1] = fuel_load_ub
+        fuel_density_samples = fuel_load_samples / self._fuel_bed_height
+        moisture_content_samples = np.ones(4) * moisture_content_lb
+        moisture_content_samples[2] = moisture_content_ub
         moisture_density_samples = moisture_content_samples * fuel_density_samples
-        wind_speed_samples = np.ones(4) * _WIND_SPEED_LB.value
-        wind_speed_samples[3] = _WIND_SPEED_UB.value
+        wind_speed_samples = np.ones(4) * wind_speed_lb
+        wind_speed_samples[3] = wind_speed_ub
       else:
-        fuel_load_samples = self._uniform(
-          _FUEL_LOAD_LB.value, _FUEL_LOAD_UB.value, _N_SAMPLES_UQ.value
-        )
-        fuel_density_samples = fuel_load_samples / _LARGE_SCALE_FUEL_BED_HEIGHT.value
-        moisture_content_samples = self._uniform(
-          _MOISTURE_CONTENT_LB.value,
-          _MOISTURE_CONTENT_UB.value,
-          _N_SAMPLES_UQ.value
+        (
+          fuel_load_samples, moisture_content_samples, wind_speed_samples
+        ) = self._uniform(
+          self._lower_bounds, self._upper_bounds, self._n_samples
         )
+        fuel_density_samples = fuel_load_samples / self._fuel_bed_height
         moisture_density_samples = moisture_content_samples * fuel_density_samples
-        wind_speed_samples = self._uniform(
-          _WIND_SPEED_LB.value, _WIND_SPEED_UB.value, _N_SAMPLES_UQ.value
-        )
     return fuel_density_samples, moisture_density_samples, wind_speed_samples
 
   def generate_data_dump_prefixes(self, data_dump_prefix):
     data_dump_prefix_base = data_dump_prefix[:-1] + "_"
-    if _MODIFY_INDIVIDUAL.value:
+    if self._modify_individual:
       data_dump_prefix_base = data_dump_prefix_base + "testrun_"
     data_dump_prefixes = []
     for i in range(self.number_of_samples()):
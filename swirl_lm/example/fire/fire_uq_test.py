@@ -0,0 +1,33 @@
+"""Tests for fire_uq."""
+
+import numpy as np
+from absl.testing import absltest
+from absl.testing import flagsaver
+
+from swirl_lm.example.fire import fire_uq
+
+
+class FireUQSamplerTest(absltest.TestCase):
+
+  @flagsaver.flagsaver(random_seed_uq=3)
+  def test_uniform_matches_separate_draws(self):
+    """Drawing all rows at once gives the numbers of one draw per row."""
+    lower_bounds = (0.09, 0.03, 5.0)
+    upper_bounds = (2.25, 0.12, 12.0)
+    n_samples = 7
+
+    samples = fire_uq.FireUQSampler()._uniform(
+      lower_bounds, upper_bounds, n_samples
+    )
+
+    rng = np.random.default_rng(3)
+    expected = [
+      (ub - lb) * rng.random(size=(n_samples,), dtype=np.float32) + lb
+      for lb, ub in zip(lower_bounds, upper_bounds)
+    ]
+    self.assertEqual(samples.shape, (3, n_samples))
+    np.testing.assert_array_equal(samples, np.stack(expected))
+
+
+if __name__ == '__main__':
+  absltest.main()
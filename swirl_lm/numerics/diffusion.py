@@ -39,7 +39,7 @@ neighboring nodes/faces. In this approach the width of the stencil in each
 direction is 3.
 """
 
-from typing import Callable, Dict, List, Optional, Sequence, Text, Tuple
+from typing import Callable, Dict, List, Optional, Sequence, Text, Tuple, Union
 
 import numpy as np
 from swirl_lm.base import parameters as parameters_lib
@@ -83,7 +83,7 @@ def diffusion_scalar(
       replicas: np.ndarray,
       phi: FlowFieldVal,
       rho: FlowFieldVal,
-      diffusivity: FlowFieldVal,
+      diffusivity: Union[FlowFieldVal, float],
       grid_spacing: Tuple[float, float, float],
       scalar_name: Optional[Text] = None,
       helper_variables: Optional[Dict[Text, FlowFieldVal]] = None,
@@ -96,7 +96,8 @@ def diffusion_scalar(
       replicas: A numpy array that maps grid coordinates to replica id numbers.
       phi: The scalar for which the diffusion term is computed.
       rho: The density of the fluid.
-      diffusivity: The kinematic diffusivity of the scalar.
+      diffusivity: The kinematic diffusivity of the scalar. A uniform
+        diffusivity can be provided as a float or a 0-D tensor.
       grid_spacing: A tuple that has the grid spacing in the x, y, and z,
         directions, respectively.
       scalar_name: The name of the scalar. This is useful for determining if
@@ -125,7 +126,13 @@ def diffusion_scalar(
         lambda f: kernel_op.apply_kernel_op_z(f, 'kdz+', 'kdz+sh'),
     )
 
-    rho_d = tf.nest.map_structure(tf.multiply, rho, diffusivity)
+    if isinstance(diffusivity, float) or (
+        isinstance(diffusivity, tf.Tensor) and diffusivity.shape.rank == 0
+    ):
+      # A uniform diffusivity is broadcast, so it's never expanded to a field.
+      rho_d = tf.nest.map_structure(lambda rho_i: diffusivity * rho_i, rho)
+    else:
+      rho_d = tf.nest.map_structure(tf.multiply, rho, diffusivity)
 
     rho_d_dim = [
         tf.nest.map_structure(
@@ -0,0 +1,70 @@
+# Copyright 2023 The swirl_lm Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for diffusion."""
+
+import numpy as np
+from swirl_lm.base import parameters
+from swirl_lm.numerics import diffusion
+from swirl_lm.utility import get_kernel_fn
+import tensorflow as tf
+
+_CONFIG = """
+    solver_procedure: VARIABLE_DENSITY
+    convection_scheme: CONVECTION_SCHEME_QUICK
+    time_integration_scheme: TIME_SCHEME_CN_EXPLICIT_ITERATION
+    scalars { name: "Y_O" diffusivity: 1e-5 density: 1.0 }
+"""
+_DIFFUSIVITY = 2e-3
+_GRID_SPACING = (0.1, 0.2, 0.3)
+
+
+class DiffusionScalarTest(tf.test.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    params = parameters.SwirlLMParameters.config_from_text_proto(_CONFIG)
+    self.diffusion_fn = diffusion.diffusion_scalar(params)
+    self.kernel_op = get_kernel_fn.ApplyKernelConvOp(4)
+
+    rng = np.random.RandomState(7)
+    self.phi = tf.unstack(
+        tf.constant(rng.uniform(size=(8, 8, 8)), dtype=tf.float32))
+    self.rho = tf.unstack(
+        tf.constant(1.0 + rng.uniform(size=(8, 8, 8)), dtype=tf.float32))
+
+  def _diffusion(self, diffusivity):
+    return self.diffusion_fn(
+        self.kernel_op,
+        tf.constant(0),
+        np.array([[[0]]]),
+        self.phi,
+        self.rho,
+        diffusivity,
+        _GRID_SPACING,
+        'Y_O',
+    )
+
+  def testUniformDiffusivityMatchesDiffusivityField(self):
+    """A float or 0-D diffusivity gives the same flux as a uniform field."""
+    expected = self._diffusion(
+        [_DIFFUSIVITY * tf.ones_like(rho_i) for rho_i in self.rho])
+
+    for diffusivity in (_DIFFUSIVITY, tf.constant(_DIFFUSIVITY)):
+      with self.subTest(diffusivity=type(diffusivity).__name__):
+        self.assertAllClose(expected, self._diffusion(diffusivity))
+
+
+if __name__ == '__main__':
+  tf.test.main()
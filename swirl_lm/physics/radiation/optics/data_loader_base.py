@@ -46,11 +46,33 @@ class DataLoaderBase(metaclass=abc.ABCMeta):
     """Utility function for generating an index from a sequence of names."""
     return {name: idx for idx, name in enumerate(name_arr)}
 
+  @classmethod
+  def _uniform_grid(cls, reference_values: np.ndarray) -> Tuple[float, float]:
+    """Returns the first value and inverse spacing of an evenly spaced grid.
+
+    These are returned as Python floats so that they enter the interpolation
+    kernels as compile-time constants instead of being read from the tables.
+
+    Args:
+      reference_values: A 1-D array of evenly spaced reference values.
+
+    Returns:
+      A 2-tuple of the first reference value and the inverse of the spacing
+      between consecutive reference values, computed in `np.float32` as the
+      tables are.
+    """
+    reference_values = reference_values.astype(np.float32)
+    return (
+        float(reference_values[0]),
+        float(1.0 / (reference_values[1] - reference_values[0])),
+    )
+
   @classmethod
   def _parse_nc_file(
       cls,
       path: str,
       exclude_vars: Sequence[str] = (),
+      bfloat16_vars: Sequence[str] = (),
   ) -> Tuple[nc.Dataset, types.VariableMap, types.DimensionMap]:
     """Utility function for unpacking the RRTMGP files and loading tensors.
 
@@ -61,6 +83,11 @@ class DataLoaderBase(metaclass=abc.ABCMeta):
     Args:
       path: Full path of a zipped netCDF dataset file.
       exclude_vars: Names of variables that should be skipped.
+      bfloat16_vars: Names of variables that should be stored as `tf.bfloat16`
+        instead of `tf.float32`, which halves the memory traffic of large
+        tables that are only read through lookups. Note that `tf.bfloat16` has
+        an 8-bit significand, so the values of these variables only keep about
+        3 significant decimal digits.
 
     Returns:
       A 3-tuple of 1) the original netCDF Dataset, 2) a dictionary containing
@@ -79,7 +106,11 @@ class DataLoaderBase(metaclass=abc.ABCMeta):
         val = val.astype(np.float32)
       # Create a tf.Variable that delays materializing the content until graph
       # execution.
-      tensor_dict.update({key: tf.Variable(lambda: val, shape=val.shape)})  # pylint: disable=cell-var-from-loop
+      if key in bfloat16_vars:
+        init_fn = lambda: tf.cast(val, tf.bfloat16)  # pylint: disable=cell-var-from-loop
+      else:
+        init_fn = lambda: val  # pylint: disable=cell-var-from-loop
+      tensor_dict.update({key: tf.Variable(init_fn, shape=val.shape)})
     return (ds, tensor_dict, dim_map)
 
   @classmethod
@@ -28,7 +28,7 @@
 """Utility functions for computing optical properties of atmospheric gases."""
 
 import collections
-from typing import Dict, Optional, Text
+from typing import Dict, Optional, Sequence, Text, Union
 
 from swirl_lm.physics.radiation.optics import lookup_gas_optics_base
 from swirl_lm.physics.radiation.optics import lookup_gas_optics_longwave
@@ -48,17 +48,74 @@ LookupVolumeMixingRatio = lookup_volume_mixing_ratio.LookupVolumeMixingRatio
 
 _PASCAL_TO_HPASCAL_FACTOR = 0.01
 
+# A single g-point or a sequence of g-points.
+GPoints = Union[int, Sequence[int]]
+
+
+def _band(lookup_gas_optics: AbstractLookupGasOptics, igpt: GPoints) -> int:
+  """Finds the frequency band that all the g-points in `igpt` belong to."""
+  if not isinstance(igpt, Sequence):
+    return lookup_gas_optics.g_point_to_bnd[igpt]
+  bands = {lookup_gas_optics.g_point_to_bnd[i] for i in igpt}
+  if len(bands) != 1:
+    raise ValueError(
+        f'The g-points {igpt} must belong to a single band, but they span the'
+        f' bands {sorted(bands)}.'
+    )
+  return bands.pop()
+
+
+def _g_point_coeffs(
+    coeffs: tf.Tensor,
+    igpt: Union[GPoints, tf.Tensor],
+) -> tf.Tensor:
+  """Slices the coefficients of `igpt` from the last axis of `coeffs`.
+
+  For a sequence of g-points the g-point axis is moved to the front, where it
+  becomes a batch axis of the interpolation.
+
+  Args:
+    coeffs: A table of coefficients with g-points along the last axis.
+    igpt: A single g-point or a sequence of g-points.
+
+  Returns:
+    The coefficients of a single g-point, or those of the sequence of g-points
+    stacked along the first axis.
+  """
+  g_point_coeffs = tf.gather(coeffs, igpt, axis=-1)
+  rank = g_point_coeffs.shape.rank
+  if rank < coeffs.shape.rank:
+    return g_point_coeffs
+  return tf.transpose(g_point_coeffs, [rank - 1] + list(range(rank - 1)))
+
 
 def _pressure_interpolant(
     p: tf.Tensor,
-    p_ref: tf.Tensor,
+    lookup_gas_optics: AbstractLookupGasOptics,
     troposphere_offset: Optional[tf.Tensor] = None,
 ) -> Interpolant:
   """Creates a pressure interpolant based on reference pressure values."""
   log_p = tf.math.log(p)
-  log_p_ref = tf.math.log(p_ref)
+  log_p_ref = tf.math.log(lookup_gas_optics.p_ref)
   return optics_utils.create_linear_interpolant(
-      log_p, log_p_ref, offset=troposphere_offset
+      log_p,
+      log_p_ref,
+      offset=troposphere_offset,
+      f0=lookup_gas_optics.log_p_ref_f0,
+      inv_delta=lookup_gas_optics.log_p_ref_inv_delta,
+  )
+
+
+def _temperature_interpolant(
+    temperature: tf.Tensor,
+    lookup_gas_optics: AbstractLookupGasOptics,
+) -> Interpolant:
+  """Creates a temperature interpolant based on reference temperatures."""
+  return optics_utils.create_linear_interpolant(
+      temperature,
+      lookup_gas_optics.t_ref,
+      f0=lookup_gas_optics.t_ref_f0,
+      inv_delta=lookup_gas_optics.t_ref_inv_delta,
   )
 
 
@@ -67,7 +124,10 @@ def _mixing_fraction_interpolant(
 ) -> Interpolant:
   """Creates a mixing fraction interpolant based on desired number of points."""
   return optics_utils.create_linear_interpolant(
-      f, tf.linspace(0.0, 1.0, n_mixing_fraction)
+      f,
+      tf.linspace(0.0, 1.0, n_mixing_fraction),
+      f0=0.0,
+      inv_delta=float(n_mixing_fraction - 1),
   )
 
 
@@ -200,7 +260,7 @@ def compute_major_optical_depth(
     molecules: tf.Tensor,
     temperature: tf.Tensor,
     p: tf.Tensor,
-    igpt: int,
+    igpt: GPoints,
     vmr_fields: Optional[Dict[int, tf.Tensor]] = None,
 ) -> tf.Tensor:
   """Computes the optical depth contributions from major gases.
@@ -215,14 +275,14 @@ def compute_major_optical_depth(
     temperature: A `tf.Tensor` containing temperature values (in K).
     p: A `tf.Tensor` containing pressure values (in Pa).
     igpt: The absorption variable index (g-point) for which the optical depth
-      is computed.
+      is computed, or a sequence of g-points from a single band.
     vmr_fields: An optional dictionary containing precomputed volume mixing
       ratio fields, keyed by gas index, that will overwrite the global means for
       those gases that have a vmr field already available.
 
   Returns:
     A `tf.Tensor` with the pointwise optical depth contributions from the major
-    species.
+    species, with a leading g-point axis if `igpt` is a sequence.
   """
   # Take the troposphere limit into account when indexing into the major species
   # and absorption coefficients.
@@ -233,14 +293,14 @@ def compute_major_optical_depth(
       x=tf.ones_like(p, dtype=tf.int32),
       y=tf.zeros_like(p, dtype=tf.int32),
   )
-  t_interp = optics_utils.create_linear_interpolant(
-      temperature, lookup_gas_optics.t_ref
-  )
+  t_interp = _temperature_interpolant(temperature, lookup_gas_optics)
   p_interp = _pressure_interpolant(
-      p=p, p_ref=lookup_gas_optics.p_ref, troposphere_offset=troposphere_idx
+      p=p,
+      lookup_gas_optics=lookup_gas_optics,
+      troposphere_offset=troposphere_idx,
   )
   # The frequency band for which the optical depth is computed.
-  ibnd = lookup_gas_optics.g_point_to_bnd[igpt]
+  ibnd = _band(lookup_gas_optics, igpt)
 
   def mix_interpolant_fn(dep: Dict[Text, IndexAndWeight]) -> Interpolant:
     """Relative abundance interpolant function that depends on `t` and `p`."""
@@ -261,7 +321,8 @@ def compute_major_optical_depth(
       ('m', mix_interpolant_fn),
   ))
   return molecules * optics_utils.interpolate(
-      lookup_gas_optics.kmajor[..., igpt], interpolant_fns=interpolant_fn_dict
+      _g_point_coeffs(lookup_gas_optics.kmajor, igpt),
+      interpolant_fns=interpolant_fn_dict,
   )
 
 
@@ -271,7 +332,7 @@ def _compute_minor_optical_depth(
     molecules: tf.Tensor,
     temperature: tf.Tensor,
     p: tf.Tensor,
-    igpt: int,
+    igpt: GPoints,
     is_lower_atmosphere: bool,
     vmr_fields: Optional[Dict[int, tf.Tensor]] = None,
 ) -> tf.Tensor:
@@ -287,7 +348,7 @@ def _compute_minor_optical_depth(
     temperature: The temperature of the flow field [K].
     p: The pressure field (in Pa).
     igpt: The absorption rank (g-point) index for which the optical depth
-      will be computed.
+      will be computed, or a sequence of g-points from a single band.
     is_lower_atmosphere: A boolean indicating whether in the lower atmosphere.
     vmr_fields: An optional dictionary containing precomputed volume mixing
       ratio fields, keyed by gas index, that will overwrite the global means for
@@ -295,7 +356,7 @@ def _compute_minor_optical_depth(
 
   Returns:
     A `tf.Tensor` with the pointwise optical depth contributions from the minor
-    species.
+    species, with a leading g-point axis if `igpt` is a sequence.
   """
   # The troposphere index is 1 for levels above the troposphere limit and 0
   # otherwise.
@@ -343,20 +404,26 @@ def _compute_minor_optical_depth(
       else lookup.minor_upper_gpt_shift
   )
   kminor = lookup.kminor_lower if is_lower_atmosphere else lookup.kminor_upper
-  ibnd = lookup.g_point_to_bnd[igpt]
+  ibnd = _band(lookup, igpt)
 
-  loc_in_bnd = igpt - lookup.bnd_lims_gpt[ibnd, 0]
-
-  temperature_interpolant = optics_utils.create_linear_interpolant(
-      temperature, lookup.t_ref
+  # The band limits keep the 1-based g-point indices of the RRTMGP tables, so
+  # the 0-based index of the first g-point of the band is one less.
+  loc_in_bnd = tf.convert_to_tensor(igpt, lookup.bnd_lims_gpt.dtype) - (
+      lookup.bnd_lims_gpt[ibnd, 0] - 1
   )
 
+  temperature_interpolant = _temperature_interpolant(temperature, lookup)
+
   if vmr_fields is not None and lookup.idx_h2o in vmr_fields:
     dry_factor = 1.0 / (1.0 + vmr_fields[lookup.idx_h2o])
   else:
     dry_factor = 1.0
 
   tau_minor = tf.zeros_like(temperature)
+  if isinstance(igpt, Sequence):
+    # The g-points are a leading batch axis, also in bands without any minor
+    # absorbers.
+    tau_minor = tf.stack([tau_minor] * len(igpt))
 
   def mix_interpolant_fn(dep: Dict[Text, IndexAndWeight]) -> Interpolant:
     """Relative abundance interpolant that depends on `t`."""
@@ -394,7 +461,7 @@ def _compute_minor_optical_depth(
 
     tau_minor += (
         optics_utils.interpolate(
-            kminor[..., k_loc],
+            _g_point_coeffs(kminor, k_loc),
             OrderedDict((
                 ('t', lambda _: temperature_interpolant),
                 ('m', mix_interpolant_fn),
@@ -411,7 +478,7 @@ def compute_minor_optical_depth(
     molecules: tf.Tensor,
     temperature: tf.Tensor,
     p: tf.Tensor,
-    igpt: int,
+    igpt: GPoints,
     vmr_fields: Optional[Dict[int, tf.Tensor]] = None,
 ) -> tf.Tensor:
   """Computes the optical depth contributions from minor gases.
@@ -427,14 +494,14 @@ def compute_minor_optical_depth(
     temperature: The temperature of the flow field [K].
     p: The pressure field (in Pa).
     igpt: The absorption rank (g-point) index for which the optical depth
-      will be computed.
+      will be computed, or a sequence of g-points from a single band.
     vmr_fields: An optional dictionary containing precomputed volume mixing
       ratio fields, keyed by gas index, that will overwrite the global means for
       those gases that have a vmr field already available.
 
   Returns:
     A `tf.Tensor` with the pointwise optical depth contributions from the minor
-    species.
+    species, with a leading g-point axis if `igpt` is a sequence.
   """
   # The troposphere index is 1 for levels above the troposphere limit and 0
   # otherwise.
@@ -464,7 +531,7 @@ def compute_rayleigh_optical_depth(
     molecules: tf.Tensor,
     temperature: tf.Tensor,
     p: tf.Tensor,
-    igpt: int,
+    igpt: GPoints,
     vmr_fields: Optional[Dict[int, tf.Tensor]] = None,
 ) -> tf.Tensor:
   """Computes the optical depth contribution from Rayleigh scattering.
@@ -480,14 +547,14 @@ def compute_rayleigh_optical_depth(
     temperature: Temperature variable (in K).
     p: The pressure field (in Pa).
     igpt: The absorption variable index (g-point) for which the optical depth
-      will be computed.
+      will be computed, or a sequence of g-points from a single band.
     vmr_fields: An optional dictionary containing precomputed volume mixing
       ratio fields, keyed by gas index, that will overwrite the global means for
       those gases that have a vmr field already available.
 
   Returns:
     A `tf.Tensor` with the pointwise optical depth contributions from Rayleigh
-      scattering.
+      scattering, with a leading g-point axis if `igpt` is a sequence.
   """
   # The troposphere index is 1 for levels above the troposphere limit and 0
   # otherwise.
@@ -496,10 +563,8 @@ def compute_rayleigh_optical_depth(
       x=tf.ones_like(p, dtype=tf.int32),
       y=tf.zeros_like(p, dtype=tf.int32),
   )
-  temperature_interpolant = optics_utils.create_linear_interpolant(
-      temperature, lkp.t_ref
-  )
-  ibnd = lkp.g_point_to_bnd[igpt]
+  temperature_interpolant = _temperature_interpolant(temperature, lkp)
+  ibnd = _band(lkp, igpt)
 
   def mix_interpolant_fn(dep: Dict[Text, IndexAndWeight]) -> Interpolant:
     """Relative abundance interpolant function that depends on `t` and `p`."""
@@ -512,10 +577,10 @@ def compute_rayleigh_optical_depth(
       (('t', lambda _: temperature_interpolant), ('m', mix_interpolant_fn))
   )
   rayl_tau_lower = optics_utils.interpolate(
-      lkp.rayl_lower[..., igpt], interpolant_fns
+      _g_point_coeffs(lkp.rayl_lower, igpt), interpolant_fns
   )
   rayl_tau_upper = optics_utils.interpolate(
-      lkp.rayl_upper[..., igpt], interpolant_fns
+      _g_point_coeffs(lkp.rayl_upper, igpt), interpolant_fns
   )
   if vmr_fields is not None and lkp.idx_h2o in vmr_fields:
     factor = 1.0 + vmr_fields[lkp.idx_h2o]
@@ -538,7 +603,7 @@ def compute_planck_fraction(
     vmr_lib: LookupVolumeMixingRatio,
     p: tf.Tensor,
     temperature: tf.Tensor,
-    igpt: int,
+    igpt: GPoints,
     vmr_fields: Optional[Dict[int, tf.Tensor]] = None,
 ) -> tf.Tensor:
   """Computes the Planck fraction that will be used to weight the Planck source.
@@ -551,13 +616,14 @@ def compute_planck_fraction(
     p: The pressure of the flow field [Pa].
     temperature: The temperature at the grid cell center [K].
     igpt: The absorption rank (g-point) index for which the optical depth will
-      be computed.
+      be computed, or a sequence of g-points from a single band.
     vmr_fields: An optional dictionary containing precomputed volume mixing
       ratio fields, keyed by gas index, that will overwrite the global means for
       those gases that have a vmr field already available.
 
   Returns:
-    The pointwise Planck fraction associated with the temperature field.
+    The pointwise Planck fraction associated with the temperature field, with a
+    leading g-point axis if `igpt` is a sequence.
   """
   # The troposphere index is 1 for levels above the troposphere limit and 0
   # otherwise.
@@ -566,13 +632,9 @@ def compute_planck_fraction(
       x=tf.ones_like(p, dtype=tf.int32),
       y=tf.zeros_like(p, dtype=tf.int32),
   )
-  temperature_interpolant = optics_utils.create_linear_interpolant(
-      temperature, lookup.t_ref
-  )
-  pressure_interpolant = _pressure_interpolant(
-      p, lookup.p_ref, tropo_idx
-  )
-  ibnd = lookup.g_point_to_bnd[igpt]
+  temperature_interpolant = _temperature_interpolant(temperature, lookup)
+  pressure_interpolant = _pressure_interpolant(p, lookup, tropo_idx)
+  ibnd = _band(lookup, igpt)
 
   def mix_interpolant_fn(dep: Dict[Text, IndexAndWeight]) -> Interpolant:
     """Relative abundance interpolant function that depends on `temperature`."""
@@ -594,7 +656,7 @@ def compute_planck_fraction(
 
   # 3-D interpolation of the Planck fraction.
   return optics_utils.interpolate(
-      lookup.planck_fraction[..., igpt], interpolants_fns
+      _g_point_coeffs(lookup.planck_fraction, igpt), interpolants_fns
   )
 
 
@@ -602,7 +664,7 @@ def compute_planck_sources(
     lookup: LookupGasOpticsLongwave,
     planck_fraction: tf.Tensor,
     temperature: tf.Tensor,
-    igpt: int,
+    igpt: GPoints,
 ) -> tf.Tensor:
   """Computes the Planck source for the longwave problem.
 
@@ -613,17 +675,27 @@ def compute_planck_sources(
     temperature: The temperature [K] for which the Planck source will be
       computed.
     igpt: The absorption rank (g-point) index for which the optical depth will
-      be computed.
+      be computed, or a sequence of g-points, which may span several bands.
 
   Returns:
-    The planck source emanating from the points with given `temperature` [W/m²].
+    The planck source emanating from the points with given `temperature` [W/m²],
+    with a leading g-point axis if `igpt` is a sequence.
   """
-  ibnd = lookup.g_point_to_bnd[igpt]
+  if isinstance(igpt, Sequence):
+    # Each g-point takes the Planck source of its band.
+    totplnk = tf.gather(
+        lookup.totplnk, [lookup.g_point_to_bnd[i] for i in igpt]
+    )
+  else:
+    totplnk = lookup.totplnk[lookup.g_point_to_bnd[igpt], :]
 
   # 1-D interpolation of the Planck source.
   interpolant = optics_utils.create_linear_interpolant(
-      temperature, lookup.t_planck
+      temperature,
+      lookup.t_planck,
+      f0=lookup.t_planck_f0,
+      inv_delta=lookup.t_planck_inv_delta,
   )
   return planck_fraction * optics_utils.interpolate(
-      lookup.totplnk[ibnd, :], OrderedDict({'t': lambda _: interpolant})
+      totplnk, OrderedDict({'t': lambda _: interpolant})
   )
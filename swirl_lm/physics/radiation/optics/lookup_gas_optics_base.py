@@ -40,6 +40,13 @@ import tensorflow as tf
 
 
 DRY_AIR_KEY = 'dry_air'
+# Absorption coefficient tables that can optionally be stored in `tf.bfloat16`.
+# These are the largest tables and are only read through the interpolation
+# lookups, which cast the gathered values back to `tf.float32`. The
+# coefficients then keep about 3 significant digits, which is traded for half
+# the memory traffic of the lookups. All other tables, including the Planck
+# fraction and the Rayleigh scattering tables, always stay in `tf.float32`.
+BFLOAT16_TABLES = ('kmajor', 'kminor_lower', 'kminor_upper')
 
 
 @dataclasses.dataclass(frozen=True)
@@ -153,6 +160,12 @@ class AbstractLookupGasOptics(loader.DataLoaderBase, metaclass=abc.ABCMeta):
   vmr_ref: tf.Tensor
   # Mapping from gas name to index.
   idx_gases: Dict[str, int]
+  # First reference temperature and inverse of the spacing of `t_ref`.
+  t_ref_f0: float
+  t_ref_inv_delta: float
+  # First log of reference pressure and inverse of the spacing of `log(p_ref)`.
+  log_p_ref_f0: float
+  log_p_ref_inv_delta: float
 
   @classmethod
   def _bytes_to_str(cls, split_str):
@@ -294,6 +307,10 @@ class AbstractLookupGasOptics(loader.DataLoaderBase, metaclass=abc.ABCMeta):
             ds['scaling_gas_upper'][:].data,
         )
     )
+    t_ref_f0, t_ref_inv_delta = cls._uniform_grid(ds['temp_ref'][:].data)
+    log_p_ref_f0, log_p_ref_inv_delta = cls._uniform_grid(
+        np.log(ds['press_ref'][:].data.astype(np.float32))
+    )
     # Decrement indices since RRTMGP was originally developed in a 1-based index
     # system.
     bnd_limits_gpt = ds['bnd_limits_gpt'][:].data - 1
@@ -361,6 +378,10 @@ class AbstractLookupGasOptics(loader.DataLoaderBase, metaclass=abc.ABCMeta):
         upper_scale_by_complement=tables['scale_by_complement_upper'],
         p_ref=p_ref,
         t_ref=t_ref,
+        t_ref_f0=t_ref_f0,
+        t_ref_inv_delta=t_ref_inv_delta,
+        log_p_ref_f0=log_p_ref_f0,
+        log_p_ref_inv_delta=log_p_ref_inv_delta,
         p_ref_min=p_ref_min,
         temperature_ref_min=temperature_ref_min,
         dtemp=dtemp,
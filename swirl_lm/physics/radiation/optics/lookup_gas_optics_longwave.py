@@ -48,6 +48,9 @@ class LookupGasOpticsLongwave(gas_base.AbstractLookupGasOptics):
   t_planck: tf.Tensor
   # total Planck source for each band `(n_bnd, n_t_plnk)`.
   totplnk: tf.Tensor
+  # First reference temperature and inverse of the spacing of `t_planck`.
+  t_planck_f0: float
+  t_planck_inv_delta: float
 
   @classmethod
   def _load_data(
@@ -73,11 +76,14 @@ class LookupGasOpticsLongwave(gas_base.AbstractLookupGasOptics):
     data['planck_fraction'] = tables['plank_fraction']
     data['t_planck'] = tables['temperature_Planck']
     data['totplnk'] = tables['totplnk']
+    data['t_planck_f0'], data['t_planck_inv_delta'] = cls._uniform_grid(
+        ds['temperature_Planck'][:].data
+    )
     return data
 
   @classmethod
   def from_nc_file(
-      cls, path: str
+      cls, path: str, bfloat16_tables: bool = False
   ) -> 'LookupGasOpticsLongwave':
     """Instantiates a `LookupGasOpticsLongwave` object from zipped netCDF file.
 
@@ -88,10 +94,15 @@ class LookupGasOpticsLongwave(gas_base.AbstractLookupGasOptics):
     Args:
       path: The full path of the zipped netCDF file containing the longwave
         absorption coefficient lookup table.
+      bfloat16_tables: Whether to store the absorption coefficient tables in
+        `tf.bfloat16` instead of `tf.float32`.
 
     Returns:
       A `LookupGasOpticsLongwave` object.
     """
-    ds, tables, dims = cls._parse_nc_file(path)
+    ds, tables, dims = cls._parse_nc_file(
+        path,
+        bfloat16_vars=gas_base.BFLOAT16_TABLES if bfloat16_tables else (),
+    )
     kwargs = cls._load_data(ds, tables, dims)
     return cls(**kwargs)
@@ -80,7 +80,7 @@ class LookupGasOpticsShortwave(gas_base.AbstractLookupGasOptics):
 
   @classmethod
   def from_nc_file(
-      cls, path: str
+      cls, path: str, bfloat16_tables: bool = False
   ) -> 'LookupGasOpticsShortwave':
     """Instantiates a `LookupGasOpticsShortwave` object from zipped netCDF file.
 
@@ -91,10 +91,15 @@ class LookupGasOpticsShortwave(gas_base.AbstractLookupGasOptics):
     Args:
       path: The full path of the zipped netCDF file containing the shortwave
         absorption coefficient lookup table.
+      bfloat16_tables: Whether to store the absorption coefficient tables in
+        `tf.bfloat16` instead of `tf.float32`.
 
     Returns:
       A `LookupGasOpticsShortwave` object.
     """
-    ds, tables, dims = cls._parse_nc_file(path)
+    ds, tables, dims = cls._parse_nc_file(
+        path,
+        bfloat16_vars=gas_base.BFLOAT16_TABLES if bfloat16_tables else (),
+    )
     kwargs = cls._load_data(ds, tables, dims)
     return cls(**kwargs)
@@ -14,7 +14,8 @@
 
 """Implementations of `OpticsScheme`s and a factory method."""
 
-from typing import Any, Callable, Dict, Optional, Sequence
+import itertools
+from typing import Any, Callable, Dict, List, Optional, Sequence
 
 import numpy as np
 from swirl_lm.physics.radiation.config import radiative_transfer_pb2
@@ -39,6 +40,19 @@ FlowFieldMap = types.FlowFieldMap
 FlowFieldVal = types.FlowFieldVal
 
 
+def _g_points_by_band(
+    lookup_gas_optics: AbstractLookupGasOptics,
+) -> List[List[int]]:
+  """Groups the g-points into the contiguous ranges of each frequency band."""
+  return [
+      list(g_points)
+      for _, g_points in itertools.groupby(
+          range(lookup_gas_optics.n_gpt),
+          key=lambda igpt: lookup_gas_optics.g_point_to_bnd[igpt],
+      )
+  ]
+
+
 class RRTMOptics(optics_base.OpticsScheme):
   """The Rapid Radiative Transfer Model (RRTM) optics scheme implementation."""
 
@@ -54,11 +68,15 @@ class RRTMOptics(optics_base.OpticsScheme):
     rrtm_params = params.rrtm_optics
     self.vmr_lib = vmr_lib
     self.gas_optics_lw = LookupGasOpticsLongwave.from_nc_file(
-        rrtm_params.longwave_nc_filepath
+        rrtm_params.longwave_nc_filepath,
+        rrtm_params.bfloat16_absorption_tables,
     )
     self.gas_optics_sw = LookupGasOpticsShortwave.from_nc_file(
-        rrtm_params.shortwave_nc_filepath
+        rrtm_params.shortwave_nc_filepath,
+        rrtm_params.bfloat16_absorption_tables,
     )
+    self._g_points_lw = _g_points_by_band(self.gas_optics_lw)
+    self._g_points_sw = _g_points_by_band(self.gas_optics_sw)
 
   def _compute_optical_depth_fn(
       self,
@@ -66,7 +84,7 @@ class RRTMOptics(optics_base.OpticsScheme):
       mols: tf.Tensor,
       temperature: tf.Tensor,
       pressure: tf.Tensor,
-      igpt: int,
+      igpt: gas_optics.GPoints,
       vmr_fields: Optional[Dict[int, tf.Tensor]] = None,
   ) -> tf.Tensor:
     """Computes total optical depth from major and minor gas contributions."""
@@ -144,45 +162,47 @@ class RRTMOptics(optics_base.OpticsScheme):
     split_inputs = [[extract_arg(arg, i) for arg in args] for i in range(n)]
     return [fn(*split_inputs[i]) for i in range(n)]
 
-  def compute_lw_optical_properties(
+  def _concat_g_points(
       self,
-      pressure: FlowFieldVal,
-      temperature: FlowFieldVal,
-      molecules: FlowFieldVal,
-      igpt: int,
-      vmr_fields: Optional[Dict[int, FlowFieldVal]] = None,
-  ) -> FlowFieldMap:
-    """Computes the monochromatic longwave optical properties.
-
-    Uses the RRTM optics scheme to compute the longwave optical depth, albedo,
-    and asymmetry factor. These raw optical properties can be further
-    transformed downstream to better suit the assumptions of the particular
-    radiative transfer solver being used.
+      fn: Callable[[gas_optics.GPoints], tf.Tensor],
+      g_points_by_band: Sequence[gas_optics.GPoints],
+  ) -> tf.Tensor:
+    """Evaluates `fn` one band at a time and joins the g-point axes.
 
     Args:
-      pressure: The pressure field [Pa].
-      temperature: The temperature [K].
-      molecules: The number of molecules in an atmospheric grid cell per area
-        [molecules / m^2].
-      igpt: The spectral interval index, or g-point.
-      vmr_fields: An optional dictionary containing precomputed volume mixing
-        ratio fields, keyed by gas index, that will overwrite the global means.
+      fn: A function of the g-points of a single band.
+      g_points_by_band: The g-points of each band. A single band may also be
+        given by a single g-point, in which case there is no g-point axis.
 
     Returns:
-      A dictionary containing (for a single g-point):
-        'optical_depth': The longwave optical depth.
-        'ssa': The longwave single-scattering albedo.
-        'asymmetry_factor': The longwave asymmetry factor.
+      The result of `fn` for a single band, or the results of all bands
+      concatenated along their leading g-point axis.
     """
+    if len(g_points_by_band) == 1:
+      return fn(g_points_by_band[0])
+    return tf.concat([fn(g_points) for g_points in g_points_by_band], axis=0)
+
+  def _lw_optical_properties(
+      self,
+      pressure: FlowFieldVal,
+      temperature: FlowFieldVal,
+      molecules: FlowFieldVal,
+      g_points_by_band: Sequence[gas_optics.GPoints],
+      vmr_fields: Optional[Dict[int, FlowFieldVal]] = None,
+  ) -> FlowFieldMap:
+    """Computes the longwave optical properties of the `g_points_by_band`."""
 
     def optical_depth_lw_fn(molecules, temperature, pressure, vmr_fields):
-      return self._compute_optical_depth_fn(
-          self.gas_optics_lw,
-          molecules,
-          temperature,
-          pressure,
-          igpt,
-          vmr_fields,
+      return self._concat_g_points(
+          lambda g_points: self._compute_optical_depth_fn(
+              self.gas_optics_lw,
+              molecules,
+              temperature,
+              pressure,
+              g_points,
+              vmr_fields,
+          ),
+          g_points_by_band,
       )
 
     optical_depth_lw = self._map_fn(
@@ -196,64 +216,49 @@ class RRTMOptics(optics_base.OpticsScheme):
         'asymmetry_factor': zeros,
     }
 
-  def compute_sw_optical_properties(
+  def _sw_optical_properties(
       self,
       pressure: FlowFieldVal,
       temperature: FlowFieldVal,
       molecules: FlowFieldVal,
-      igpt: int,
+      g_points_by_band: Sequence[gas_optics.GPoints],
       vmr_fields: Optional[Dict[int, FlowFieldVal]] = None,
   ) -> FlowFieldMap:
-    """Computes the monochromatic shortwave optical properties.
-
-    Uses the RRTM optics scheme to compute the shortwave optical depth, albedo,
-    and asymmetry factor. These raw optical properties can be further
-    transformed downstream to better suit the assumptions of the particular
-    radiative transfer solver being used.
-
-    Args:
-      pressure: The pressure field [Pa].
-      temperature: The temperature [K].
-      molecules: The number of molecules in an atmospheric grid cell per area
-        [molecules / m^2].
-      igpt: The spectral interval index, or g-point.
-      vmr_fields: An optional dictionary containing precomputed volume mixing
-        ratio fields, keyed by gas index, that will overwrite the global means.
-
-    Returns:
-      A dictionary containing (for a single g-point):
-        'optical_depth': The shortwave optical depth.
-        'ssa': The shortwave single-scattering albedo.
-        'asymmetry_factor': The shortwave asymmetry factor.
-    """
+    """Computes the shortwave optical properties of the `g_points_by_band`."""
 
     def optical_depth_sw_fn(molecules, temperature, pressure, vmr_fields):
-      return self._compute_optical_depth_fn(
-          self.gas_optics_sw,
-          molecules,
-          temperature,
-          pressure,
-          igpt,
-          vmr_fields,
+      return self._concat_g_points(
+          lambda g_points: self._compute_optical_depth_fn(
+              self.gas_optics_sw,
+              molecules,
+              temperature,
+              pressure,
+              g_points,
+              vmr_fields,
+          ),
+          g_points_by_band,
       )
 
-    def rayleigh_scattering_fn(molecules, temperature, pressure):
-      return gas_optics.compute_rayleigh_optical_depth(
-          self.gas_optics_sw,
-          self.vmr_lib,
-          molecules,
-          temperature,
-          pressure,
-          igpt,
-          vmr_fields,
+    def rayleigh_scattering_fn(molecules, temperature, pressure, vmr_fields):
+      return self._concat_g_points(
+          lambda g_points: gas_optics.compute_rayleigh_optical_depth(
+              self.gas_optics_sw,
+              self.vmr_lib,
+              molecules,
+              temperature,
+              pressure,
+              g_points,
+              vmr_fields,
+          ),
+          g_points_by_band,
       )
 
     optical_depth_sw = self._map_fn(
         optical_depth_sw_fn, molecules, temperature, pressure, vmr_fields,
     )
 
-    rayleigh_scattering = tf.nest.map_structure(
-        rayleigh_scattering_fn, molecules, temperature, pressure
+    rayleigh_scattering = self._map_fn(
+        rayleigh_scattering_fn, molecules, temperature, pressure, vmr_fields,
     )
     optical_depth_sw = tf.nest.map_structure(
         tf.math.add, optical_depth_sw, rayleigh_scattering
@@ -267,45 +272,24 @@ class RRTMOptics(optics_base.OpticsScheme):
         'asymmetry_factor': tf.nest.map_structure(tf.zeros_like, ssa),
     }
 
-  def compute_planck_sources(
+  def _planck_sources(
       self,
       replica_id: tf.Tensor,
       replicas: np.ndarray,
       pressure: FlowFieldVal,
       temperature: FlowFieldVal,
-      igpt: int,
+      g_points_by_band: Sequence[gas_optics.GPoints],
       vmr_fields: Optional[Dict[int, FlowFieldVal]] = None,
       sfc_temperature: Optional[FlowFieldVal] = None,
   ) -> FlowFieldMap:
-    """Computes the monochromatic Planck sources given the atmospheric state.
-
-    This requires interpolating the temperature at cell faces using a high-order
-    scheme.
-
-    Args:
-      replica_id: The index of the current TPU replica.
-      replicas: The mapping from the core coordinate to the local replica id
-        `replica_id`.
-      pressure: The pressure field [Pa].
-      temperature: The temperature [K].
-      igpt: The spectral interval index, or g-point.
-      vmr_fields: An optional dictionary containing precomputed volume mixing
-        ratio fields, keyed by gas index, that will overwrite the global means.
-      sfc_temperature: The optional surface temperature [K] represented as
-        either a 3D `tf.Tensor` or as a list of 2D `tf.Tensor`s but having a
-        single vertical dimension.
-
-    Returns:
-      A dictionary containing the Planck source at the cell center
-      (`planck_src`), the top cell boundary (`planck_src_top`), the bottom cell
-      boundary (`planck_src_bottom`) and, if a `sfc_temperature` argument was
-      provided, the surface cell boundary (`planck_src_sfc`). Note that the
-      surface source will only be valid for the replicas in the first
-      computational layer, as the local temperature field is used to compute it.
-    """
+    """Computes the Planck sources of the `g_points_by_band`."""
     temperature_bottom, temperature_top = self._reconstruct_face_values(
         replica_id, replicas, temperature
     )
+    if len(g_points_by_band) == 1:
+      g_points = g_points_by_band[0]
+    else:
+      g_points = list(itertools.chain.from_iterable(g_points_by_band))
 
     def planck_fraction_fn(
         pressure: tf.Tensor,
@@ -313,22 +297,18 @@ class RRTMOptics(optics_base.OpticsScheme):
         vmr_fields: Optional[Dict[int, tf.Tensor]] = None,
     ):
       """Precomputes Planck fraction that is used for all Planck sources."""
-      return gas_optics.compute_planck_fraction(
-          self.gas_optics_lw,
-          self.vmr_lib,
-          pressure,
-          temperature,
-          igpt,
-          vmr_fields,
+      return self._concat_g_points(
+          lambda band_g_points: gas_optics.compute_planck_fraction(
+              self.gas_optics_lw,
+              self.vmr_lib,
+              pressure,
+              temperature,
+              band_g_points,
+              vmr_fields,
+          ),
+          g_points_by_band,
       )
 
-    planck_fraction = self._map_fn(
-        planck_fraction_fn,
-        pressure,
-        temperature,
-        vmr_fields,
-    )
-
     def planck_src_fn(
         planck_fraction: tf.Tensor,
         temperature: tf.Tensor,
@@ -338,19 +318,26 @@ class RRTMOptics(optics_base.OpticsScheme):
           self.gas_optics_lw,
           planck_fraction,
           temperature,
-          igpt,
+          g_points,
       )
+
+    planck_fraction = self._map_fn(
+        planck_fraction_fn,
+        pressure,
+        temperature,
+        vmr_fields,
+    )
     temperature_fields = {
         'planck_src': temperature,
         'planck_src_top': temperature_top,
         'planck_src_bottom': temperature_bottom,
     }
     planck_srcs = {}
-    for k, temperature in temperature_fields.items():
+    for k, temperature_field in temperature_fields.items():
       planck_srcs[k] = tf.nest.map_structure(
           planck_src_fn,
           planck_fraction,
-          temperature,
+          temperature_field,
       )
 
     def slice_bottom(f: FlowFieldVal):
@@ -359,7 +346,16 @@ class RRTMOptics(optics_base.OpticsScheme):
       return f1[0] if isinstance(f, tf.Tensor) or self._g_dim != 2 else f1
 
     if sfc_temperature is not None:
-      planck_fraction_0 = slice_bottom(planck_fraction)
+      # The Planck fraction is pointwise, so it is evaluated directly on the
+      # first fluid layer, where a g-point axis doesn't offset the slicing.
+      planck_fraction_0 = self._map_fn(
+          planck_fraction_fn,
+          slice_bottom(pressure),
+          slice_bottom(temperature),
+          None
+          if vmr_fields is None
+          else {k: slice_bottom(v) for k, v in vmr_fields.items()},
+      )
       planck_src_sfc = self._map_fn(
           planck_src_fn,
           planck_fraction_0,
@@ -377,6 +373,228 @@ class RRTMOptics(optics_base.OpticsScheme):
       )
     return planck_srcs
 
+  def compute_lw_optical_properties(
+      self,
+      pressure: FlowFieldVal,
+      temperature: FlowFieldVal,
+      molecules: FlowFieldVal,
+      igpt: int,
+      vmr_fields: Optional[Dict[int, FlowFieldVal]] = None,
+  ) -> FlowFieldMap:
+    """Computes the monochromatic longwave optical properties.
+
+    Uses the RRTM optics scheme to compute the longwave optical depth, albedo,
+    and asymmetry factor. These raw optical properties can be further
+    transformed downstream to better suit the assumptions of the particular
+    radiative transfer solver being used.
+
+    Args:
+      pressure: The pressure field [Pa].
+      temperature: The temperature [K].
+      molecules: The number of molecules in an atmospheric grid cell per area
+        [molecules / m^2].
+      igpt: The spectral interval index, or g-point.
+      vmr_fields: An optional dictionary containing precomputed volume mixing
+        ratio fields, keyed by gas index, that will overwrite the global means.
+
+    Returns:
+      A dictionary containing (for a single g-point):
+        'optical_depth': The longwave optical depth.
+        'ssa': The longwave single-scattering albedo.
+        'asymmetry_factor': The longwave asymmetry factor.
+    """
+    return self._lw_optical_properties(
+        pressure, temperature, molecules, [igpt], vmr_fields
+    )
+
+  def compute_sw_optical_properties(
+      self,
+      pressure: FlowFieldVal,
+      temperature: FlowFieldVal,
+      molecules: FlowFieldVal,
+      igpt: int,
+      vmr_fields: Optional[Dict[int, FlowFieldVal]] = None,
+  ) -> FlowFieldMap:
+    """Computes the monochromatic shortwave optical properties.
+
+    Uses the RRTM optics scheme to compute the shortwave optical depth, albedo,
+    and asymmetry factor. These raw optical properties can be further
+    transformed downstream to better suit the assumptions of the particular
+    radiative transfer solver being used.
+
+    Args:
+      pressure: The pressure field [Pa].
+      temperature: The temperature [K].
+      molecules: The number of molecules in an atmospheric grid cell per area
+        [molecules / m^2].
+      igpt: The spectral interval index, or g-point.
+      vmr_fields: An optional dictionary containing precomputed volume mixing
+        ratio fields, keyed by gas index, that will overwrite the global means.
+
+    Returns:
+      A dictionary containing (for a single g-point):
+        'optical_depth': The shortwave optical depth.
+        'ssa': The shortwave single-scattering albedo.
+        'asymmetry_factor': The shortwave asymmetry factor.
+    """
+    return self._sw_optical_properties(
+        pressure, temperature, molecules, [igpt], vmr_fields
+    )
+
+  def compute_planck_sources(
+      self,
+      replica_id: tf.Tensor,
+      replicas: np.ndarray,
+      pressure: FlowFieldVal,
+      temperature: FlowFieldVal,
+      igpt: int,
+      vmr_fields: Optional[Dict[int, FlowFieldVal]] = None,
+      sfc_temperature: Optional[FlowFieldVal] = None,
+  ) -> FlowFieldMap:
+    """Computes the monochromatic Planck sources given the atmospheric state.
+
+    This requires interpolating the temperature at cell faces using a high-order
+    scheme.
+
+    Args:
+      replica_id: The index of the current TPU replica.
+      replicas: The mapping from the core coordinate to the local replica id
+        `replica_id`.
+      pressure: The pressure field [Pa].
+      temperature: The temperature [K].
+      igpt: The spectral interval index, or g-point.
+      vmr_fields: An optional dictionary containing precomputed volume mixing
+        ratio fields, keyed by gas index, that will overwrite the global means.
+      sfc_temperature: The optional surface temperature [K] represented as
+        either a 3D `tf.Tensor` or as a list of 2D `tf.Tensor`s but having a
+        single vertical dimension.
+
+    Returns:
+      A dictionary containing the Planck source at the cell center
+      (`planck_src`), the top cell boundary (`planck_src_top`), the bottom cell
+      boundary (`planck_src_bottom`) and, if a `sfc_temperature` argument was
+      provided, the surface cell boundary (`planck_src_sfc`). Note that the
+      surface source will only be valid for the replicas in the first
+      computational layer, as the local temperature field is used to compute it.
+    """
+    return self._planck_sources(
+        replica_id,
+        replicas,
+        pressure,
+        temperature,
+        [igpt],
+        vmr_fields,
+        sfc_temperature,
+    )
+
+  @tf.function(jit_compile=True, reduce_retracing=True)
+  def compute_lw_optical_properties_all_gpt(
+      self,
+      pressure: FlowFieldVal,
+      temperature: FlowFieldVal,
+      molecules: FlowFieldVal,
+      vmr_fields: Optional[Dict[int, FlowFieldVal]] = None,
+  ) -> FlowFieldMap:
+    """Computes the longwave optical properties of all the g-points.
+
+    The g-points of a band share the temperature, pressure, and relative
+    abundance interpolants, so the coefficients of a whole band are interpolated
+    at once, with the g-points as a leading batch axis. Since all the g-points
+    are computed in a single call, it is compiled with XLA and traced only once.
+    Note that XLA drops assertions, so the validation of the volume mixing
+    ratios in `gas_optics.get_vmr` doesn't run on this path.
+
+    Args:
+      pressure: The pressure field [Pa].
+      temperature: The temperature [K].
+      molecules: The number of molecules in an atmospheric grid cell per area
+        [molecules / m^2].
+      vmr_fields: An optional dictionary containing precomputed volume mixing
+        ratio fields, keyed by gas index, that will overwrite the global means.
+
+    Returns:
+      A dictionary containing (with a leading axis of size `n_gpt_lw`):
+        'optical_depth': The longwave optical depth.
+        'ssa': The longwave single-scattering albedo.
+        'asymmetry_factor': The longwave asymmetry factor.
+    """
+    return self._lw_optical_properties(
+        pressure, temperature, molecules, self._g_points_lw, vmr_fields
+    )
+
+  @tf.function(jit_compile=True, reduce_retracing=True)
+  def compute_sw_optical_properties_all_gpt(
+      self,
+      pressure: FlowFieldVal,
+      temperature: FlowFieldVal,
+      molecules: FlowFieldVal,
+      vmr_fields: Optional[Dict[int, FlowFieldVal]] = None,
+  ) -> FlowFieldMap:
+    """Computes the shortwave optical properties of all the g-points.
+
+    As in the longwave case, the coefficients of each band are interpolated at
+    once, with the g-points as a leading batch axis, and the call is compiled
+    with XLA, so the volume mixing ratios are not validated either.
+
+    Args:
+      pressure: The pressure field [Pa].
+      temperature: The temperature [K].
+      molecules: The number of molecules in an atmospheric grid cell per area
+        [molecules / m^2].
+      vmr_fields: An optional dictionary containing precomputed volume mixing
+        ratio fields, keyed by gas index, that will overwrite the global means.
+
+    Returns:
+      A dictionary containing (with a leading axis of size `n_gpt_sw`):
+        'optical_depth': The shortwave optical depth.
+        'ssa': The shortwave single-scattering albedo.
+        'asymmetry_factor': The shortwave asymmetry factor.
+    """
+    return self._sw_optical_properties(
+        pressure, temperature, molecules, self._g_points_sw, vmr_fields
+    )
+
+  def compute_planck_sources_all_gpt(
+      self,
+      replica_id: tf.Tensor,
+      replicas: np.ndarray,
+      pressure: FlowFieldVal,
+      temperature: FlowFieldVal,
+      vmr_fields: Optional[Dict[int, FlowFieldVal]] = None,
+      sfc_temperature: Optional[FlowFieldVal] = None,
+  ) -> FlowFieldMap:
+    """Computes the Planck sources of all the longwave g-points.
+
+    The face temperatures are reconstructed only once for all the g-points, and
+    the Planck fraction of each band is interpolated at once, with the g-points
+    as a leading batch axis.
+
+    Args:
+      replica_id: The index of the current TPU replica.
+      replicas: The mapping from the core coordinate to the local replica id
+        `replica_id`.
+      pressure: The pressure field [Pa].
+      temperature: The temperature [K].
+      vmr_fields: An optional dictionary containing precomputed volume mixing
+        ratio fields, keyed by gas index, that will overwrite the global means.
+      sfc_temperature: The optional surface temperature [K] represented as
+        either a 3D `tf.Tensor` or as a list of 2D `tf.Tensor`s but having a
+        single vertical dimension.
+
+    Returns:
+      The dictionary of Planck sources of `compute_planck_sources`, where each
+      field has a leading axis of size `n_gpt_lw`.
+    """
+    return self._planck_sources(
+        replica_id,
+        replicas,
+        pressure,
+        temperature,
+        self._g_points_lw,
+        vmr_fields,
+        sfc_temperature,
+    )
+
   @property
   def n_gpt_lw(self) -> int:
     """The number of g-points in the longwave bands."""
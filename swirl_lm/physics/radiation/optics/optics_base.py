@@ -31,6 +31,23 @@ FlowFieldVal = types.FlowFieldVal
 FlowFieldMap = types.FlowFieldMap
 
 
+def _slab(f: tf.Tensor, axis: int, start: int, size: int) -> tf.Tensor:
+  """Slices `size` layers of `f` starting from `start` along `axis`."""
+  begin = [0] * f.shape.rank
+  slab_size = [-1] * f.shape.rank
+  begin[axis] = start
+  slab_size[axis] = size
+  return tf.slice(f, begin, slab_size)
+
+
+def _stack_g_points(props: Sequence[FlowFieldMap]) -> FlowFieldMap:
+  """Stacks per-g-point fields along a new leading g-point axis."""
+  return {
+      k: tf.nest.map_structure(lambda *f: tf.stack(f), *[p[k] for p in props])
+      for k in props[0]
+  }
+
+
 class OpticsScheme(metaclass=abc.ABCMeta):
   """Abstract base class for optics scheme."""
 
@@ -45,12 +62,23 @@ class OpticsScheme(metaclass=abc.ABCMeta):
     self._halos = halos
     self._face_interp_scheme_order = params.face_interp_scheme_order
     self._kernel_op = kernel_op
-    self._kernel_op.add_kernel({'shift_dn': ([0.0, 0.0, 1.0], 1)})
-    self._shift_down_fn = (
-        lambda f: kernel_op.apply_kernel_op_x(f, 'shift_dnx'),
-        lambda f: kernel_op.apply_kernel_op_y(f, 'shift_dny'),
-        lambda f: kernel_op.apply_kernel_op_z(f, 'shift_dnz', 'shift_dnzsh'),
-    )[g_dim]
+
+  def _shift_down(self, f: tf.Tensor) -> tf.Tensor:
+    """Shifts the 3D tensor `f` down by one layer along the vertical.
+
+    The shift is a slice of `f` that is padded with a copy of the top layer, so
+    no convolution is needed and the outermost layer keeps its value.
+
+    Args:
+      f: A 3D tensor with the vertical dimension at axis `(g_dim + 1) % 3`.
+
+    Returns:
+      The shifted tensor, which has the same shape as `f`.
+    """
+    axis = (self._g_dim + 1) % 3
+    n = f.shape[axis]
+    return tf.concat([_slab(f, axis, 1, n - 1), _slab(f, axis, n - 1, 1)],
+                     axis=axis)
 
   @abc.abstractmethod
   def compute_lw_optical_properties(
@@ -134,6 +162,112 @@ class OpticsScheme(metaclass=abc.ABCMeta):
       cell boundary (`planck_src_bottom`).
     """
 
+  def compute_lw_optical_properties_all_gpt(
+      self,
+      pressure: FlowFieldVal,
+      temperature: FlowFieldVal,
+      mols: FlowFieldVal,
+      vmr_fields: Optional[Dict[int, FlowFieldVal]] = None,
+  ) -> FlowFieldMap:
+    """Computes the longwave optical properties of all the g-points.
+
+    The default implementation computes the g-points one at a time and stacks
+    the results.
+
+    Args:
+      pressure: The pressure field [Pa].
+      temperature: The temperature [K].
+      mols: The number of molecules in an atmospheric grid cell per area
+        [molecules / m^2].
+      vmr_fields: An optional dictionary containing precomputed volume mixing
+        ratio fields, keyed by gas index, that will overwrite the global means.
+
+    Returns:
+      The dictionary of `compute_lw_optical_properties`, where each field has
+      an additional leading axis of size `n_gpt_lw` (on every z-level if the
+      fields are sequences of 2D tensors).
+    """
+    return _stack_g_points([
+        self.compute_lw_optical_properties(
+            pressure, temperature, mols, igpt, vmr_fields
+        )
+        for igpt in range(self.n_gpt_lw)
+    ])
+
+  def compute_sw_optical_properties_all_gpt(
+      self,
+      pressure: FlowFieldVal,
+      temperature: FlowFieldVal,
+      mols: FlowFieldVal,
+      vmr_fields: Optional[Dict[int, FlowFieldVal]] = None,
+  ) -> FlowFieldMap:
+    """Computes the shortwave optical properties of all the g-points.
+
+    The default implementation computes the g-points one at a time and stacks
+    the results.
+
+    Args:
+      pressure: The pressure field [Pa].
+      temperature: The temperature [K].
+      mols: The number of molecules in an atmospheric grid cell per area
+        [molecules / m^2].
+      vmr_fields: An optional dictionary containing precomputed volume mixing
+        ratio fields, keyed by gas index, that will overwrite the global means.
+
+    Returns:
+      The dictionary of `compute_sw_optical_properties`, where each field has
+      an additional leading axis of size `n_gpt_sw` (on every z-level if the
+      fields are sequences of 2D tensors).
+    """
+    return _stack_g_points([
+        self.compute_sw_optical_properties(
+            pressure, temperature, mols, igpt, vmr_fields
+        )
+        for igpt in range(self.n_gpt_sw)
+    ])
+
+  def compute_planck_sources_all_gpt(
+      self,
+      replica_id: tf.Tensor,
+      replicas: np.ndarray,
+      pressure: FlowFieldVal,
+      temperature: FlowFieldVal,
+      vmr_fields: Optional[Dict[int, FlowFieldVal]] = None,
+      sfc_temperature: Optional[FlowFieldVal] = None,
+  ) -> FlowFieldMap:
+    """Computes the Planck sources of all the longwave g-points.
+
+    The default implementation computes the g-points one at a time and stacks
+    the results.
+
+    Args:
+      replica_id: The index of the current TPU replica.
+      replicas: The mapping from the core coordinate to the local replica id
+        `replica_id`.
+      pressure: The pressure field [Pa].
+      temperature: The temperature [K].
+      vmr_fields: An optional dictionary containing precomputed volume mixing
+        ratio fields, keyed by gas index, that will overwrite the global means.
+      sfc_temperature: The optional surface temperature [K].
+
+    Returns:
+      The dictionary of `compute_planck_sources`, where each field has an
+      additional leading axis of size `n_gpt_lw` (on every z-level if the fields
+      are sequences of 2D tensors).
+    """
+    return _stack_g_points([
+        self.compute_planck_sources(
+            replica_id,
+            replicas,
+            pressure,
+            temperature,
+            igpt,
+            vmr_fields,
+            sfc_temperature=sfc_temperature,
+        )
+        for igpt in range(self.n_gpt_lw)
+    ])
+
   @property
   @abc.abstractmethod
   def n_gpt_lw(self) -> int:
@@ -144,30 +278,26 @@ class OpticsScheme(metaclass=abc.ABCMeta):
   def n_gpt_sw(self) -> int:
     """The number of g-points in the shortwave bands."""
 
-  def _slice_field(
-      self,
-      f: FlowFieldVal,
-      dim: int,
-      face: int,
-      idx: int,
-  ) -> FlowFieldVal:
-    """Slices a plane from `f` normal to `dim`."""
-    face_slice = common_ops.get_face(f, dim, face, idx)
-    if isinstance(f, tf.Tensor) or dim != 2:
-      # Remove the outer list.
-      return face_slice[0]
-    return face_slice
-
-  def _field_shape(
-      self,
-      f: FlowFieldVal,
-  ) -> FlowFieldVal:
-    """Returns the x, y, and z dimensions of the field `f`."""
-    if isinstance(f, tf.Tensor):
-      input_shape = f.get_shape().as_list()
-      return input_shape[1:] + input_shape[:1]
-    else:
-      return f[0].get_shape().as_list() + [len(f)]
+  def _boundary_planes(self, f: tf.Tensor) -> Sequence[Sequence[tf.Tensor]]:
+    """Returns the halo planes of `f` at both ends of the vertical dimension.
+
+    The planes of each face are extracted with a single slice of the halo slab
+    instead of one slice per halo layer.
+
+    Args:
+      f: The 3D tensor from which the boundary planes are extracted.
+
+    Returns:
+      A pair with the `halos` bottom planes and the `halos` top planes, both in
+      ascending order along the vertical dimension.
+    """
+    halos = self._halos
+    axis = (self._g_dim + 1) % 3
+    n = f.shape[axis]
+    return [
+        tf.split(_slab(f, axis, start, halos), halos, axis=axis)
+        for start in (0, n - halos)
+    ]
 
   def _exchange_halos(
       self,
@@ -176,23 +306,15 @@ class OpticsScheme(metaclass=abc.ABCMeta):
       f: FlowFieldVal,
   ) -> FlowFieldVal:
     """Exchanges halos, preserving the boundary values along the vertical."""
-    boundary_vals = [
-        [self._slice_field(f, self._g_dim, face, i) for i in range(self._halos)]
-        for face in range(2)
-    ]
-    # Reverse the order of the top boundary values to restore ascending order.
-    boundary_vals[1].reverse()
-
-    if self._g_dim == 2 and isinstance(f, Sequence):
-      # Unnest the 2D plane.
-      boundary_vals = [[v_i[0] for v_i in v] for v in boundary_vals]
+    f_dense = common_ops.to_3d_tensor(f)
+    boundary_vals = self._boundary_planes(f_dense)
 
     bc = [[(halo_exchange.BCType.NEUMANN, 0.0)] * 2 for _ in range(3)]
     bc[self._g_dim] = [
         (halo_exchange.BCType.DIRICHLET, bv) for bv in boundary_vals
     ]
-    return halo_exchange.inplace_halo_exchange(
-        f,
+    f_dense = halo_exchange.inplace_halo_exchange(
+        f_dense,
         (0, 1, 2),
         replica_id,
         replicas,
@@ -201,6 +323,7 @@ class OpticsScheme(metaclass=abc.ABCMeta):
         boundary_conditions=bc,
         width=self._halos,
     )
+    return common_ops.from_3d_tensor(f_dense, like=f)
 
   def _reconstruct_face_values(
       self,
@@ -220,32 +343,21 @@ class OpticsScheme(metaclass=abc.ABCMeta):
       A tuple with the reconstructed temperature at the bottom and top face,
       respectively.
     """
+    # The reconstruction is performed on a single dense 3D tensor, so that each
+    # step is one op on the whole field rather than one op per z-slice.
+    f_dense = common_ops.to_3d_tensor(f)
+
     dim = ('x', 'y', 'z')[self._g_dim]
     f_neg, f_pos = interpolation.weno(
-        f, dim=dim, k=self._face_interp_scheme_order
-    )
-    f_bottom = self._exchange_halos(
-        replica_id,
-        replicas,
-        tf.nest.map_structure(
-            lambda x, y: 0.5 * (x + y),
-            f_neg,
-            f_pos,
-        ),
+        f_dense, dim=dim, k=self._face_interp_scheme_order
     )
+    f_bottom = self._exchange_halos(replica_id, replicas, 0.5 * (f_neg + f_pos))
 
-    # Shift down to obtain the top cell face values and pad the top outermost
-    # halo layer with a copy of the adjacent inner layer.
-    f_top = self._shift_down_fn(f_bottom)
-    outermost_valid_top_layer = self._slice_field(
-        f_top, self._g_dim, face=1, idx=1
-    )
-    shape = self._field_shape(f_top)
-    # Update the last halo layer along the vertical.
-    f_top = common_ops.tensor_scatter_1d_update(
-        f_top,
-        self._g_dim,
-        shape[self._g_dim] - 1,
-        outermost_valid_top_layer,
+    # Shift down to obtain the top cell face values. The top outermost halo
+    # layer is padded with a copy of the adjacent inner layer.
+    f_top = self._shift_down(f_bottom)
+
+    return (
+        common_ops.from_3d_tensor(f_bottom, like=f),
+        common_ops.from_3d_tensor(f_top, like=f),
     )
-    return f_bottom, f_top
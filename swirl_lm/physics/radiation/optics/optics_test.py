@@ -0,0 +1,187 @@
+# Copyright 2023 The swirl_lm Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for optics."""
+
+import os
+
+import numpy as np
+from swirl_lm.physics.radiation.config import radiative_transfer_pb2
+from swirl_lm.physics.radiation.optics import lookup_volume_mixing_ratio
+from swirl_lm.physics.radiation.optics import optics
+from swirl_lm.physics.radiation.optics import optics_base
+from swirl_lm.utility import get_kernel_fn
+import tensorflow as tf
+
+from google.protobuf import text_format
+
+_DATA_DIR = os.path.join(os.path.dirname(__file__), 'rrtmgp-data')
+_HALOS = 2
+# The batched and the per-g-point lookups are compiled by XLA as different
+# kernels, whose float32 rounding of the interpolation weights can differ by an
+# ulp. Steep absorption coefficient tables amplify this to a relative
+# difference of a few 1e-5.
+_RTOL = 1e-4
+
+
+def _rrtm_optics(
+    bfloat16_absorption_tables: bool = False,
+) -> optics.RRTMOptics:
+  """Creates an `RRTMOptics` scheme from the bundled RRTMGP tables."""
+  params = text_format.Parse(
+      f"""
+      rrtm_optics {{
+        longwave_nc_filepath: '{_DATA_DIR}/clearsky_lw.nc'
+        shortwave_nc_filepath: '{_DATA_DIR}/clearsky_sw.nc'
+        bfloat16_absorption_tables: {str(bfloat16_absorption_tables).lower()}
+      }}
+      """,
+      radiative_transfer_pb2.OpticsParameters(),
+  )
+  vmr_lib = lookup_volume_mixing_ratio.LookupVolumeMixingRatio.from_nc_file(
+      os.path.join(_DATA_DIR, 'clearsky_as.nc'), site_coord=0, exp_label=0
+  )
+  return optics.RRTMOptics(
+      vmr_lib,
+      params,
+      get_kernel_fn.ApplyKernelConvOp(4),
+      g_dim=2,
+      halos=_HALOS,
+  )
+
+
+def _atmospheric_state():
+  """Returns pressure, temperature, and molecules on a small 3D grid."""
+  nz, nx, ny = 8, 4, 4
+  z = np.linspace(0.0, 1.0, nz)[:, np.newaxis, np.newaxis]
+  noise = np.random.RandomState(42).uniform(size=(nz, nx, ny))
+  pressure = tf.constant(9e4 - 7e4 * z + 1e3 * noise, dtype=tf.float32)
+  temperature = tf.constant(290.0 - 60.0 * z + 2.0 * noise, dtype=tf.float32)
+  molecules = tf.constant(
+      1e24 * (1.0 + 0.1 * noise) * np.ones((nz, nx, ny)), dtype=tf.float32
+  )
+  return pressure, temperature, molecules
+
+
+class RRTMOpticsTest(tf.test.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.optics = _rrtm_optics()
+    self.pressure, self.temperature, self.molecules = _atmospheric_state()
+
+  def testLwOpticalPropertiesAllGptMatchesPerGPoint(self):
+    """The batched longwave properties match those of each g-point."""
+    batched = self.optics.compute_lw_optical_properties_all_gpt(
+        self.pressure, self.temperature, self.molecules
+    )
+    expected = optics_base.OpticsScheme.compute_lw_optical_properties_all_gpt(
+        self.optics, self.pressure, self.temperature, self.molecules
+    )
+
+    self.assertCountEqual(expected.keys(), batched.keys())
+    for k in expected:
+      with self.subTest(name=k):
+        self.assertAllClose(expected[k], batched[k], rtol=_RTOL)
+
+  def testSwOpticalPropertiesAllGptMatchesPerGPoint(self):
+    """The batched shortwave properties match those of each g-point."""
+    batched = self.optics.compute_sw_optical_properties_all_gpt(
+        self.pressure, self.temperature, self.molecules
+    )
+    expected = optics_base.OpticsScheme.compute_sw_optical_properties_all_gpt(
+        self.optics, self.pressure, self.temperature, self.molecules
+    )
+
+    self.assertCountEqual(expected.keys(), batched.keys())
+    for k in expected:
+      with self.subTest(name=k):
+        self.assertAllClose(expected[k], batched[k], rtol=_RTOL)
+
+  def testBfloat16AbsorptionTablesBoundOpticalDepthError(self):
+    """bfloat16 tables keep the optical depths within 1% of float32 ones."""
+    optics_bf16 = _rrtm_optics(bfloat16_absorption_tables=True)
+    self.assertEqual(tf.float32, self.optics.gas_optics_lw.kmajor.dtype)
+    self.assertEqual(tf.bfloat16, optics_bf16.gas_optics_lw.kmajor.dtype)
+
+    for name, n_gpt in (('lw', self.optics.n_gpt_lw),
+                        ('sw', self.optics.n_gpt_sw)):
+      # A sample of g-points spread over all the bands.
+      for igpt in range(0, n_gpt, 16):
+        with self.subTest(name=name, igpt=igpt):
+          compute_fn = f'compute_{name}_optical_properties'
+          expected = getattr(self.optics, compute_fn)(
+              self.pressure, self.temperature, self.molecules, igpt
+          )
+          result = getattr(optics_bf16, compute_fn)(
+              self.pressure, self.temperature, self.molecules, igpt
+          )
+          self.assertAllClose(
+              expected['optical_depth'],
+              result['optical_depth'],
+              rtol=1e-2,
+              atol=0.0,
+          )
+
+  def testPlanckSourcesAllGptMatchesPerGPoint(self):
+    """The batched Planck sources match those of each g-point."""
+    replica_id = tf.constant(0)
+    replicas = np.array([[[0]]])
+
+    batched = self.optics.compute_planck_sources_all_gpt(
+        replica_id, replicas, self.pressure, self.temperature
+    )
+    expected = optics_base.OpticsScheme.compute_planck_sources_all_gpt(
+        self.optics, replica_id, replicas, self.pressure, self.temperature
+    )
+
+    self.assertCountEqual(expected.keys(), batched.keys())
+    for k in expected:
+      with self.subTest(name=k):
+        self.assertAllClose(expected[k], batched[k], rtol=_RTOL)
+
+
+  def testPlanckSourcesInGraphModeMatchEager(self):
+    """Tracing the Planck sources keeps the static shapes used for slicing."""
+    replica_id = tf.constant(0)
+    replicas = np.array([[[0]]])
+    sfc_temperature = tf.fill((1, 4, 4), 295.0)
+
+    def planck_sources_fn(pressure, temperature, sfc_temperature):
+      return self.optics.compute_planck_sources(
+          replica_id,
+          replicas,
+          pressure,
+          temperature,
+          igpt=3,
+          sfc_temperature=sfc_temperature,
+      )
+
+    graph_fn = tf.function(planck_sources_fn)
+    traced = graph_fn.get_concrete_function(
+        self.pressure, self.temperature, sfc_temperature
+    ).structured_outputs
+    graph = graph_fn(self.pressure, self.temperature, sfc_temperature)
+    eager = planck_sources_fn(self.pressure, self.temperature, sfc_temperature)
+
+    self.assertCountEqual(eager.keys(), graph.keys())
+    self.assertIn('planck_src_sfc', graph)
+    for k in eager:
+      with self.subTest(name=k):
+        self.assertEqual(eager[k].shape, traced[k].shape)
+        self.assertAllClose(eager[k], graph[k], rtol=1e-5)
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -28,8 +28,10 @@
 """Utility library for common operations on the RRTMGP tables."""
 
 import collections
+import collections.abc
 import dataclasses
-from typing import Callable, Optional, Sequence
+import functools
+from typing import Callable, List, Mapping, Optional, Sequence, Tuple, Union
 
 from swirl_lm.physics.radiation.optics import lookup_gas_optics_base
 from swirl_lm.physics.radiation.optics import lookup_volume_mixing_ratio
@@ -40,6 +42,11 @@ LookupGasOpticsBase = lookup_gas_optics_base.AbstractLookupGasOptics
 LookupVolumeMixingRatio = lookup_volume_mixing_ratio.LookupVolumeMixingRatio
 OrderedDict = collections.OrderedDict
 
+# Whether to verify that the values being interpolated are within the range of
+# the reference values. The check adds reductions over the full field for every
+# interpolant, so it is only enabled for debugging.
+_VALIDATE_RANGE = False
+
 
 @dataclasses.dataclass
 class IndexAndWeight:
@@ -63,97 +70,266 @@ class Interpolant:
 def validate_range(
     f: tf.Tensor,
     reference_values: tf.Tensor,
-) -> None:
-  """Verifies that no value in `f` is outside the range of reference values."""
-  min_t_ref = tf.math.reduce_min(reference_values)
-  max_t_ref = tf.math.reduce_max(reference_values)
-  min_t = tf.math.reduce_min(f)
-  max_t = tf.math.reduce_max(f)
-  tf.compat.v1.assert_greater_equal(
-      min_t,
-      min_t_ref,
-      message='At least one value is below the reference range.',
-  )
-  tf.compat.v1.assert_less_equal(
-      max_t,
-      max_t_ref,
-      message='At least one value is above the reference range.',
-  )
+) -> List[Optional[tf.Operation]]:
+  """Verifies that no value in `f` is outside the range of reference values.
+
+  Args:
+    f: The tensor whose values will be checked.
+    reference_values: A 1-D tensor of reference values.
+
+  Returns:
+    The assert operations, which are `None` when executing eagerly.
+  """
+  return [
+      tf.debugging.assert_greater_equal(
+          tf.math.reduce_min(f),
+          tf.math.reduce_min(reference_values),
+          message='At least one value is below the reference range.',
+      ),
+      tf.debugging.assert_less_equal(
+          tf.math.reduce_max(f),
+          tf.math.reduce_max(reference_values),
+          message='At least one value is above the reference range.',
+      ),
+  ]
 
 
 def lookup_values(
     vals: tf.Tensor,
     idx_list: Sequence[tf.Tensor],
+    batch_axes: int = 0,
 ) -> tf.Tensor:
   """Gathers values from `vals` as specified by a list of index tensors.
 
+  Unlike `tf.gather_nd`, which gathers slices of the trailing axes when fewer
+  indices than axes are provided, the axes of `vals` not covered by `idx_list`
+  are the leading ones, which are treated as batch axes. These have to be
+  requested explicitly with `batch_axes`, so that a missing index is an error
+  rather than a silent change of semantics.
+
+  Tables stored in `tf.bfloat16` are gathered at that precision and the values
+  gathered are then cast to `tf.float32`, so only the narrow values are read.
+
   Args:
     vals: A tensor of coefficients to be gathered.
-    idx_list: A list of length equal to the rank of `vals` containing tensors of
-      indices, one for each axis of `vals` and in the same order.
+    idx_list: A list of tensors of indices, one for each of the trailing axes of
+      `vals` and in the same order.
+    batch_axes: The number of leading axes of `vals` that are not indexed and
+      are carried through as batch axes.
 
   Returns:
-    A tensor having the same shape as an element of `idx_list` where the indices
-    have been replaced by the corresponding value from `vals`.
+    A tensor having the shape of the batch axes of `vals` followed by the shape
+    of an element of `idx_list`, where the indices have been replaced by the
+    corresponding value from `vals`.
+
+  Raises:
+    ValueError: If the rank of `vals` doesn't equal the number of indices plus
+      `batch_axes`, or if there are batch axes but the shape of `vals` isn't
+      static.
   """
-  idx_list = [tf.expand_dims(idx, axis=-1) for idx in idx_list]
-  idx = tf.concat(idx_list, axis=-1)
-  return tf.gather_nd(vals, idx)
+  shape = vals.shape
+  if shape.rank is not None and shape.rank != len(idx_list) + batch_axes:
+    raise ValueError(
+        f'Expected {len(idx_list)} indices and {batch_axes} batch axes for'
+        f' `vals` of rank {shape.rank}.'
+    )
+  if not shape.is_fully_defined():
+    if batch_axes:
+      raise ValueError(
+          'Batch axes require a static shape for `vals`, but got'
+          f' {shape}.'
+      )
+    gathered = tf.gather_nd(vals, tf.stack(idx_list, axis=-1))
+  else:
+    # With a static shape, the indices are collapsed into a single linear index
+    # into the flattened `vals`, which avoids materializing the stacked indices.
+    linear_idx = idx_list[0]
+    for idx, size in zip(idx_list[1:], shape.as_list()[batch_axes + 1:]):
+      linear_idx = linear_idx * size + idx
+    gathered = tf.gather(
+        tf.reshape(vals, shape.as_list()[:batch_axes] + [-1]),
+        linear_idx,
+        axis=batch_axes,
+    )
+
+  if gathered.dtype == tf.bfloat16:
+    return tf.cast(gathered, tf.float32)
+  return gathered
 
 
 def evaluate_weighted_lookup(
     coeffs: tf.Tensor,
     weight_idx_list: Sequence[IndexAndWeight],
+    batch_axes: int = 0,
 ) -> tf.Tensor:
   """Performs a lookup of coefficients and scales them with pointwise weights.
 
   Args:
     coeffs: The tensor of coefficients that will be gathered.
     weight_idx_list: A list of `IndexAndWeight`s containing a pair of index
-      tensor and weight tensor for each axis of the `coeffs` tensor.
+      tensor and weight tensor for each trailing axis of the `coeffs` tensor.
+    batch_axes: The number of leading axes of `coeffs` that are not indexed and
+      are carried through as batch axes.
 
   Returns:
-    A tensor of the same shape as an element of `weight_idx_list` containing
-    the gathered coefficients scaled by the pointwise product of corresponding
-    weights.
+    A tensor of the same shape as an element of `weight_idx_list`, preceded by
+    the batch axes of `coeffs`, containing the gathered coefficients scaled by
+    the pointwise product of corresponding weights.
   """
-  vals = lookup_values(coeffs, [idx.idx for idx in weight_idx_list])
-  vals *= tf.math.reduce_prod(
-      tf.stack([idx.weight for idx in weight_idx_list]), axis=0
+  vals = lookup_values(
+      coeffs, [idx.idx for idx in weight_idx_list], batch_axes
   )
-  return vals
+  # The weights are multiplied pairwise instead of being stacked and reduced,
+  # which avoids allocating the stacked weights. They are multiplied together
+  # before scaling `vals`, so corners that share the leading weights share the
+  # same products, which XLA eliminates as common subexpressions.
+  return vals * functools.reduce(
+      tf.math.multiply, [idx.weight for idx in weight_idx_list]
+  )
+
+
+# Traced per coefficient shape, since relaxed shapes would lose the static rank
+# and shape that `lookup_values` relies on.
+@tf.function(jit_compile=True)
+def _sum_weighted_lookups(
+    coeffs: tf.Tensor,
+    idx: Sequence[Sequence[tf.Tensor]],
+    weights: Sequence[Sequence[tf.Tensor]],
+) -> tf.Tensor:
+  """Sums the weighted lookups of `coeffs` over all interpolation corners.
+
+  The lookups, the weight products, and the sum are compiled together with XLA
+  so that they are fused instead of being launched once per corner.
+
+  Args:
+    coeffs: The tensor of coefficients that will be gathered.
+    idx: The index tensors of each corner, one for each axis of `coeffs`.
+    weights: The weight tensors of each corner, one for each axis of `coeffs`.
+
+  Returns:
+    The sum over all corners of the gathered coefficients scaled by the
+    pointwise product of the corresponding weights.
+  """
+  # The axes of `coeffs` that are not interpolated are batch axes.
+  batch_axes = coeffs.shape.rank - len(idx[0])
+  return tf.math.add_n([
+      evaluate_weighted_lookup(
+          coeffs,
+          [IndexAndWeight(idx_i, weight_i)
+           for idx_i, weight_i in zip(idx_c, weights_c)],
+          batch_axes,
+      )
+      for idx_c, weights_c in zip(idx, weights)
+  ])
+
+
+def _clipped_floor(scaled_f: tf.Tensor, size: Union[int, tf.Tensor]):
+  """Floors `f` scaled to the reference grid to an index in [0, size - 2]."""
+  idx = tf.cast(tf.math.floor(scaled_f), tf.int32)
+  return tf.clip_by_value(idx, 0, size - 2)
 
 
 def floor_idx(
     f: tf.Tensor,
     reference_values: tf.Tensor,
+    uniform: bool = True,
 ) -> tf.Tensor:
   """Returns the indices of the floor reference values.
 
-  Note that the `reference_values` should consist of evenly spaced points. Each
-  index returned corresponds to the highest index k such that
-  reference_values[k] <= f.
+  By default the `reference_values` should consist of evenly spaced points, so
+  that the index is computed directly from the spacing. Otherwise, with
+  `uniform=False`, the reference values only need to be in strictly ascending
+  order and the index is found with a binary search. Some RRTMGP grids, e.g. the
+  reference pressures, are stored in descending order; the floor indices on such
+  a grid are obtained by negating both `f` and `reference_values`. Each index
+  returned corresponds to the highest index k such that
+  reference_values[k] <= f, clipped to the range [0, size - 2]. As in RRTMGP,
+  the floor index of the last reference value is therefore the second to last
+  one, so `k + 1` is always a valid index of the upper endpoint.
 
   Args:
     f: The tensor whose values will be mapped to a floor reference value.
-    reference_values: A 1-D tensor of reference values.
+    reference_values: A 1-D tensor of at least 2 reference values.
+    uniform: Whether the reference values are evenly spaced.
 
   Returns:
     A `tf.Tensor` of the same shape as `f` containing the indices of the floor
     reference values for the values of `f`. Each index corresponds to the
-    highest index k such that reference_values[k] <= f.
+    highest index k such that reference_values[k] <= f, clipped to the range
+    [0, size - 2].
   """
-  delta = reference_values[1] - reference_values[0]
   size = reference_values.shape[0]
-  truncated_div = tf.cast(
-      tf.math.floordiv(f - reference_values[0], delta), tf.int32)
-  return tf.clip_by_value(truncated_div, 0, size - 1)
+  if not uniform:
+    assert_ascending = tf.debugging.assert_greater(
+        reference_values[1:],
+        reference_values[:-1],
+        message='The reference values must be in strictly ascending order.',
+    )
+    checks = [assert_ascending] if assert_ascending is not None else []
+    with tf.control_dependencies(checks):
+      reference_values = tf.identity(reference_values)
+    # `tf.searchsorted` requires the values to have the rank of the reference
+    # values, so the search is done on the flattened `f`.
+    idx = tf.searchsorted(
+        reference_values,
+        tf.reshape(f, [-1]),
+        side='right',
+        out_type=tf.int32,
+    )
+    return tf.clip_by_value(tf.reshape(idx - 1, tf.shape(f)), 0, size - 2)
+
+  f0 = reference_values[0]
+  delta = reference_values[1] - f0
+  # Scaling by the inverse spacing avoids a division, which is much slower than
+  # a multiplication on accelerators.
+  return _clipped_floor((f - f0) * (1.0 / delta), size)
+
+
+# Traced per shape of `f` and per reference grid, since an input signature with
+# an unknown shape would also leave the shape of the indices and weights unknown
+# in graph mode.
+@tf.function(jit_compile=True)
+def _build_interpolant(
+    f: tf.Tensor,
+    f0: Union[float, tf.Tensor],
+    inv_delta: Union[float, tf.Tensor],
+    size: int,
+    offset: Union[int, tf.Tensor],
+) -> Tuple[tf.Tensor, tf.Tensor, tf.Tensor, tf.Tensor]:
+  """Computes the endpoint indices and weights of a linear interpolant.
+
+  The arithmetic is compiled with XLA into a single elementwise kernel. When the
+  first reference value and the inverse spacing are Python floats they are
+  folded into the kernel as constants. Otherwise they are scalar tensors read
+  from the reference tables at run time.
+
+  Args:
+    f: The values to be interpolated.
+    f0: The first reference value.
+    inv_delta: The inverse of the spacing between reference values.
+    size: The number of reference values.
+    offset: The offset added to the indices, which broadcasts against `f`.
+
+  Returns:
+    A tuple with the indices of the lower and upper endpoints, followed by their
+    interpolation weights.
+  """
+  scaled_f = (f - f0) * inv_delta
+  idx_low = _clipped_floor(scaled_f, size)
+  # The distance from the lower endpoint in units of the spacing. It is clamped
+  # to [0, 1] so that values outside of the reference range saturate at the
+  # first or last reference value instead of being extrapolated.
+  weight2 = tf.clip_by_value(scaled_f - tf.cast(idx_low, tf.float32), 0.0, 1.0)
+  idx_low += offset
+  return idx_low, idx_low + 1, 1.0 - weight2, weight2
 
 
 def create_linear_interpolant(
     f: tf.Tensor,
     f_ref: tf.Tensor,
     offset: Optional[tf.Tensor] = None,
+    f0: Optional[float] = None,
+    inv_delta: Optional[float] = None,
 ) -> Interpolant:
   """Creates a linear interpolant based on the evenly spaced reference values.
 
@@ -163,32 +339,84 @@ def create_linear_interpolant(
   the value from each endpoint.
 
   Args:
-    f: A tensor of arbitrary shape whose values must be in the range of
-      reference values in `f_ref`.
+    f: A tensor of arbitrary shape whose values should be in the range of
+      reference values in `f_ref`. Values outside of the range take the
+      coefficients of the nearest endpoint.
     f_ref: The 1-D tensor of evenly spaced reference values for the variable.
     offset: An optional tensor of the same shape as `f` that should be added
       to the interpolant indices.
+    f0: The first value of `f_ref`, if it is known when the lookup tables are
+      loaded.
+    inv_delta: The inverse of the spacing of `f_ref`, if it is known when the
+      lookup tables are loaded.
 
   Returns:
     An `Interpolant` object containing the pointwise floor and ceiling indices
     and interpolation weights of `f`.
   """
-  with tf.control_dependencies(
-      [validate_range(f, f_ref)]):
-    size = f_ref.shape[0]
-    delta = f_ref[1] - f_ref[0]
-    idx_low = floor_idx(f, f_ref)
-    idx_high = tf.math.minimum(idx_low + 1, size - 1)
-    # Compute the interpolant weights for the two endpoints.
-    lower_reference_vals = lookup_values(f_ref, (idx_low,))
-    weight2 = tf.math.abs((f - lower_reference_vals) / delta)
-    weight1 = 1.0 - weight2
-    if offset is not None:
-      idx_low += offset
-      idx_high += offset
-    idx_weight_low = IndexAndWeight(idx_low, weight1)
-    idx_weight_high = IndexAndWeight(idx_high, weight2)
-    return Interpolant(idx_weight_low, idx_weight_high)
+  if _VALIDATE_RANGE:
+    checks = [op for op in validate_range(f, f_ref) if op is not None]
+    with tf.control_dependencies(checks):
+      f = tf.identity(f)
+
+  idx_low, idx_high, weight1, weight2 = _build_interpolant(
+      f,
+      f_ref[0] if f0 is None else f0,
+      1.0 / (f_ref[1] - f_ref[0]) if inv_delta is None else inv_delta,
+      f_ref.shape[0],
+      0 if offset is None else offset,
+  )
+  idx_weight_low = IndexAndWeight(idx_low, weight1)
+  idx_weight_high = IndexAndWeight(idx_high, weight2)
+  return Interpolant(idx_weight_low, idx_weight_high)
+
+
+class _RecordingMapping(collections.abc.Mapping):
+  """A read-only view of a mapping that records which keys are read."""
+
+  def __init__(self, mapping: Mapping[str, IndexAndWeight]):
+    self._mapping = mapping
+    self.keys_read = set()
+
+  def __getitem__(self, key: str) -> IndexAndWeight:
+    self.keys_read.add(key)
+    return self._mapping[key]
+
+  def __iter__(self):
+    self.keys_read.update(self._mapping)
+    return iter(self._mapping)
+
+  def __len__(self) -> int:
+    return len(self._mapping)
+
+
+class _MemoizedInterpolantFn:
+  """Reuses interpolants across branches that agree on the dependencies read.
+
+  The dependencies of an interpolant function are discovered on its first call
+  by recording the variables it reads. Later calls with branches that hold the
+  same `IndexAndWeight` objects for these variables reuse the interpolant
+  instead of computing it again.
+  """
+
+  def __init__(self, interpolant_fn: Callable[..., Interpolant]):
+    self._interpolant_fn = interpolant_fn
+    self._keys_read = None
+    self._cache = {}
+
+  def __call__(self, dep: Mapping[str, IndexAndWeight]) -> Interpolant:
+    if self._keys_read is not None:
+      cache_key = tuple(id(dep[k]) for k in self._keys_read)
+      if cache_key in self._cache:
+        return self._cache[cache_key]
+
+    recording_dep = _RecordingMapping(dep)
+    interpolant = self._interpolant_fn(recording_dep)
+    if self._keys_read is None:
+      self._keys_read = sorted(recording_dep.keys_read)
+    if recording_dep.keys_read == set(self._keys_read):
+      self._cache[tuple(id(dep[k]) for k in self._keys_read)] = interpolant
+    return interpolant
 
 
 def interpolate(
@@ -225,58 +453,61 @@ def interpolate(
 
   interpolated_vals = interpolate(coeffs, interpolant_fns)
 
-  This function is implemented recursively, but the depth of the recursive tree
-  never exceeds the rank of the `coeffs` tensor, which is at most 3 in the
-  RRTMGP interpolations. The `idx_weight_list` contains indices and weights for
-  a particular branch of interpolation. The sum of lengths of `interpolant_fns`
-  and `idx_weight_list` will always equal the rank of `coeffs`. At each call of
-  this function, a branch of the next interpolant is selected until there are no
-  more branches left. At that point a weighted lookup is evaluated rendering the
-  interpolant value for that path. Recursively adding the weighted lookups of
-  the upper index branch and the lower index branch for each index variable
-  gives the interpolated values of the coefficients.
+  The branches of the interpolation are expanded iteratively, one variable at a
+  time, into the `2^N` corners of the interpolation cell, where `N` is the
+  number of interpolant functions (at most 3 in the RRTMGP interpolations). The
+  interpolant function of a variable is evaluated once for each distinct
+  combination of the branches it depends on, so dependent interpolants see the
+  indices of the branch they belong to, but are not recomputed for branches of
+  variables they don't read. The weighted lookups of all corners are then
+  evaluated and summed in a single XLA-compiled function, which gives the
+  interpolated values of the coefficients.
 
   Args:
     coeffs: The tensor of coefficients of arbitrary shape whose values will be
       interpolated.
     interpolant_fns: An ordered dictionary of interpolant functions keyed by the
       name of the variable they correspond to. There should be one for each axis
-      of `coeffs` and their order should match the order of the axes. Note that
-      they should be sorted in topological order (dependent indices appearing
-      after the indices they depend on). The axes of `coeffs` are assumed to
-      already conform to this ordering.
+      of the trailing axes of `coeffs` and their order should match the order
+      of the axes. Note that they should be sorted in topological order
+      (dependent indices appearing after the indices they depend on). The axes
+      of `coeffs` are assumed to already conform to this ordering. Any leading
+      axes of `coeffs` that are not interpolated are treated as batch axes.
     idx_weight_by_varname: An ordered dictionary of `IndexAndWeight` objects
       that will be used in the interpolation, indexed by variable name.
 
   Returns:
     A `tf.Tensor` of the same shape as any of the index tensors, but with the
-    indices replaced by the interpolated coefficients.
+    indices replaced by the interpolated coefficients and preceded by the batch
+    axes of `coeffs`, if any.
   """
   if idx_weight_by_varname is None:
     idx_weight_by_varname = {}
-  if not interpolant_fns:
-    if not idx_weight_by_varname:
-      raise ValueError(
-          'The number of interpolant functions must equal the rank of `coeffs`.'
-      )
-    # Recursion base case.
-    return evaluate_weighted_lookup(
-        coeffs, list(idx_weight_by_varname.values())
-    )
-  else:
-    interpolant_fns = interpolant_fns.copy()
-    varname, interpolant_fn = interpolant_fns.popitem(last=False)
-    interpolant = interpolant_fn(idx_weight_by_varname)
-    # Branch into the lower index.
-    lower_idx_weight_dict = idx_weight_by_varname.copy()
-    lower_idx_weight_dict.update({varname: interpolant.interp_low})
-    lower = interpolate(
-        coeffs, interpolant_fns.copy(), lower_idx_weight_dict
-    )
-    # Branch into the higher index.
-    higher_idx_weight_dict = idx_weight_by_varname.copy()
-    higher_idx_weight_dict.update({varname: interpolant.interp_high})
-    higher = interpolate(
-        coeffs, interpolant_fns.copy(), higher_idx_weight_dict
+  if not interpolant_fns and not idx_weight_by_varname:
+    raise ValueError(
+        'The number of interpolant functions must equal the rank of `coeffs`.'
     )
-    return lower + higher
+
+  # Expand the branches of all variables into the corners of the interpolation
+  # cell. A branch is the tuple of `IndexAndWeight`s of the variables expanded
+  # so far, and a single dictionary is pointed at the current branch to provide
+  # the dependencies of the interpolant functions, so no dictionary is copied.
+  dep = dict(idx_weight_by_varname)
+  varnames = list(dep)
+  branches = [tuple(dep.values())]
+  for varname, interpolant_fn in interpolant_fns.items():
+    interpolant_fn = _MemoizedInterpolantFn(interpolant_fn)
+    expanded_branches = []
+    for branch in branches:
+      dep.update(zip(varnames, branch))
+      interpolant = interpolant_fn(dep)
+      expanded_branches.append(branch + (interpolant.interp_low,))
+      expanded_branches.append(branch + (interpolant.interp_high,))
+    varnames.append(varname)
+    branches = expanded_branches
+
+  return _sum_weighted_lookups(
+      coeffs,
+      [[idx_weight.idx for idx_weight in branch] for branch in branches],
+      [[idx_weight.weight for idx_weight in branch] for branch in branches],
+  )
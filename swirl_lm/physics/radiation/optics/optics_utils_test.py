@@ -0,0 +1,91 @@
+# Copyright 2023 The swirl_lm Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for optics_utils."""
+
+from swirl_lm.physics.radiation.optics import optics_utils
+import tensorflow as tf
+
+
+class OpticsUtilsTest(tf.test.TestCase):
+
+  def testFloorIdxUniform(self):
+    """Floor indices on an evenly spaced grid are clipped to [0, size - 2]."""
+    reference_values = tf.constant([0.0, 1.0, 2.0, 3.0])
+    f = tf.constant([[-0.5, 0.0, 0.5], [1.0, 2.9, 3.0]])
+
+    idx = optics_utils.floor_idx(f, reference_values)
+
+    self.assertAllEqual([[0, 0, 0], [1, 2, 2]], idx)
+
+  def testFloorIdxNonUniform(self):
+    """Floor indices on an unevenly spaced grid are found by binary search."""
+    reference_values = tf.constant([0.0, 1.0, 10.0, 100.0])
+    f = tf.constant([[-1.0, 0.0, 5.0], [10.0, 99.0, 200.0]])
+
+    idx = optics_utils.floor_idx(f, reference_values, uniform=False)
+
+    self.assertAllEqual([[0, 0, 1], [2, 2, 2]], idx)
+
+  def testFloorIdxNonUniformMatchesUniformOnEvenGrid(self):
+    """Both paths give the same indices on an evenly spaced grid."""
+    reference_values = tf.linspace(1.0, 9.0, 9)
+    f = tf.random.stateless_uniform(
+        (4, 5), seed=(0, 1), minval=0.0, maxval=10.0
+    )
+
+    self.assertAllEqual(
+        optics_utils.floor_idx(f, reference_values),
+        optics_utils.floor_idx(f, reference_values, uniform=False),
+    )
+
+  def testFloorIdxNonUniformOnDescendingGridByNegation(self):
+    """A descending grid is handled by negating the values and the grid."""
+    reference_values = tf.constant([1000.0, 500.0, 100.0, 10.0])
+    f = tf.constant([900.0, 500.0, 50.0])
+
+    idx = optics_utils.floor_idx(-f, -reference_values, uniform=False)
+
+    self.assertAllEqual([0, 1, 2], idx)
+
+  def testFloorIdxNonUniformRaisesOnDescendingGrid(self):
+    """Reference values that are not ascending are rejected."""
+    reference_values = tf.constant([1000.0, 500.0, 100.0, 10.0])
+
+    with self.assertRaises(tf.errors.InvalidArgumentError):
+      optics_utils.floor_idx(
+          tf.constant([200.0]), reference_values, uniform=False
+      )
+
+
+  def testLinearInterpolantWithGridConstantsMatchesReferenceTensor(self):
+    """Passing the grid as Python floats gives the same interpolant."""
+    f_ref = tf.linspace(160.0, 355.0, 14)
+    f = tf.random.stateless_uniform(
+        (3, 4, 5), seed=(2, 3), minval=150.0, maxval=360.0
+    )
+
+    expected = optics_utils.create_linear_interpolant(f, f_ref)
+    interpolant = optics_utils.create_linear_interpolant(
+        f, f_ref, f0=160.0, inv_delta=13.0 / 195.0
+    )
+
+    for e, i in ((expected.interp_low, interpolant.interp_low),
+                 (expected.interp_high, interpolant.interp_high)):
+      self.assertAllEqual(e.idx, i.idx)
+      self.assertAllClose(e.weight, i.weight, atol=1e-5)
+
+
+if __name__ == '__main__':
+  tf.test.main()
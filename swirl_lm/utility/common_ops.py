@@ -237,6 +237,16 @@ def tf_cast(tensor: FlowFieldVal, dtype) -> FlowFieldVal:
                                tensor)
 
 
+def to_3d_tensor(f: FlowFieldVal) -> tf.Tensor:
+  """Represents `f` as a single 3D tensor with z being the leading axis."""
+  return f if isinstance(f, tf.Tensor) else tf.stack(f, axis=0)
+
+
+def from_3d_tensor(f: tf.Tensor, like: FlowFieldVal) -> FlowFieldVal:
+  """Converts the 3D tensor `f` back to the representation of `like`."""
+  return f if isinstance(like, tf.Tensor) else tf.unstack(f, axis=0)
+
+
 def average(
     a: FlowFieldVal,
     b: FlowFieldVal,